@@ -0,0 +1,84 @@
+import os
+import re
+import json
+import asyncio
+from tracing import span
+
+# Tool-using steps an agent may take before it has to give its final answer
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "6"))
+
+_FINAL = re.compile(r"Final Answer:\s*(.*)", re.S)
+_ACTION = re.compile(r"Action:\s*([\w.-]+)\s*Action Input:\s*(\{.*?\})\s*(?:$|Observation:|Thought:)", re.S)
+
+
+async def _to_thread(fn, *args, **kwargs):
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _call_tool(tool, args) -> str:
+    """Runs a tool on the worker thread; failures become the observation, as in CrewAI."""
+    try:
+        return tool.func(**args)
+    except TypeError as e:
+        return f"Wrong arguments for {tool.name}: {e}"
+    except Exception as e:
+        return f"❌ {tool.name} failed: {e}"
+
+
+def _prompt(role: str, goal: str, backstory: str, tools, task: str, expected: str, steps) -> str:
+    listing = "\n".join(f"- {t.name}: {t.description}" for t in tools)
+    scratchpad = "".join(f"{reply}\nObservation: {observation}\n" for reply, observation in steps)
+    return f"""You are {role}. {backstory}
+Your goal: {goal}
+
+You can use these tools:
+{listing}
+
+To use a tool, reply with exactly:
+Thought: <what you need next>
+Action: <tool name>
+Action Input: <JSON object of arguments>
+
+When you have the answer, reply with exactly:
+Thought: I now know the final answer
+Final Answer: <the answer>
+
+Task:{task}
+Expected output: {expected}
+
+{scratchpad}"""
+
+
+async def arun_agent(llm, name: str, role: str, goal: str, backstory: str, tools,
+                     task: str, expected: str, run_blocking=_to_thread) -> str:
+    """
+    Runs one tool-using agent on the event loop. Each LLM turn awaits the
+    wrapper's async path (acompletion), so no thread is held while the model
+    thinks; tool calls are blocking and go through run_blocking (an executor
+    lane's run() from the API). Raises LLMCallError if a completion fails.
+    """
+    by_name = {t.name: t for t in tools}
+    steps = []
+    with span("agent.arun", agent=name):
+        for _ in range(AGENT_MAX_STEPS):
+            reply = await llm.ainvoke(_prompt(role, goal, backstory, tools, task, expected, steps))
+            final = _FINAL.search(reply)
+            action = _ACTION.search(reply)
+            if final and not action:
+                return final.group(1).strip()
+            if not action:
+                # No parsable step: the reply itself is the answer
+                return reply.strip()
+            reply = reply[:action.end(2)]
+            tool = by_name.get(action.group(1))
+            if tool is None:
+                steps.append((reply, f"Unknown tool {action.group(1)}; use one of {', '.join(by_name)}."))
+                continue
+            try:
+                args = json.loads(action.group(2))
+            except json.JSONDecodeError as e:
+                steps.append((reply, f"Action Input must be a JSON object: {e}"))
+                continue
+            observation = await run_blocking(_call_tool, tool, args)
+            steps.append((reply, observation))
+        return steps[-1][1] if steps else "I cannot answer this question."
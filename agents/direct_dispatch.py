@@ -0,0 +1,50 @@
+from tools.github_tools import (
+    github_list_repos,
+    github_list_prs,
+    github_list_issues,
+    github_list_starred,
+    github_list_branches,
+    github_list_commits,
+)
+from tools.linear_tools import (
+    linear_list_issues,
+    linear_in_progress,
+    linear_high_priority,
+    linear_teams,
+    linear_projects,
+)
+
+# Listing tools that can answer a query on their own, without a CrewAI run
+DIRECT_TOOLS = {
+    t.name: t for t in (
+        github_list_repos,
+        github_list_prs,
+        github_list_issues,
+        github_list_starred,
+        github_list_branches,
+        github_list_commits,
+        linear_list_issues,
+        linear_in_progress,
+        linear_high_priority,
+        linear_teams,
+        linear_projects,
+    )
+}
+
+
+def can_dispatch(intent) -> bool:
+    return bool(intent) and intent.get("tool") in DIRECT_TOOLS
+
+
+def run_direct(intent: dict, user_key: str) -> str:
+    """
+    Calls the intent's tool function directly and returns its formatted output.
+    One service call, no agent or LLM round-trips.
+    """
+    tool = DIRECT_TOOLS[intent["tool"]]
+    args = dict(intent.get("args") or {})
+    args["user"] = user_key
+    try:
+        return tool.func(**args)
+    except Exception as e:
+        return f"❌ {tool.name} failed: {e}"
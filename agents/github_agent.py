@@ -10,32 +10,30 @@ from tools.github_tools import (
     github_search_repos
 )
 from litellm_wrapper import LiteLLMWrapper
+from agents.async_runner import arun_agent
+from tracing import span
 
 gemini_llm = LiteLLMWrapper(model="gemini/gemini-2.5-flash")
 
-def run_github_agent(query: str, user_key: str):
-    user_key = user_key.lower()  # normalize
+GITHUB_AGENT = dict(
+    role="GitHub Assistant",
+    goal="Fetch GitHub data based on user query.",
+    backstory="Expert in GitHub API, repositories, pull requests, issues, branches, commits, and stars.",
+    tools=[
+        github_list_repos,
+        github_list_prs,
+        github_list_issues,
+        github_list_starred,
+        github_list_branches,
+        github_list_commits,
+        github_search_repos,
+    ],
+)
+GITHUB_EXPECTED = "Just the GitHub result, one line per item."
 
-    github_ai = Agent(
-        role="GitHub Assistant",
-        goal="Fetch GitHub data based on user query.",
-        backstory="Expert in GitHub API, repositories, pull requests, issues, branches, commits, and stars.",
-        tools=[
-            github_list_repos,
-            github_list_prs,
-            github_list_issues,
-            github_list_starred,
-            github_list_branches,
-            github_list_commits,
-            github_search_repos,
-            
-        ],
-        verbose=False,
-        llm=gemini_llm
-    )
 
-    github_task = Task(
-        description=f"""
+def _github_task(query: str, user_key: str) -> str:
+    return f"""
 User query: "{query}"
 Internal user key: {user_key}
 
@@ -45,9 +43,18 @@ ALWAYS call GitHub tools using this user key: "{user_key}"
 Example:
 Action: github_list_repos
 Action Input: {{"user": "{user_key}"}}
-""",
+"""
+
+
+def run_github_agent(query: str, user_key: str):
+    user_key = user_key.lower()  # normalize
+
+    github_ai = Agent(**GITHUB_AGENT, verbose=False, llm=gemini_llm)
+
+    github_task = Task(
+        description=_github_task(query, user_key),
         agent=github_ai,
-        expected_output="Just the GitHub result, one line per item.",
+        expected_output=GITHUB_EXPECTED,
         input={"query": query, "user": user_key}
     )
 
@@ -58,7 +65,15 @@ Action Input: {{"user": "{user_key}"}}
         verbose=True
     )
 
-    return crew.kickoff()
+    with span("crew.kickoff", agent="github"):
+        return crew.kickoff()
+
+
+async def arun_github_agent(query: str, user_key: str, **kwargs) -> str:
+    """Async counterpart of run_github_agent; LLM turns don't hold a thread (see arun_agent)."""
+    user_key = user_key.lower()  # normalize
+    return await arun_agent(gemini_llm, "github", task=_github_task(query, user_key),
+                            expected=GITHUB_EXPECTED, **GITHUB_AGENT, **kwargs)
 
 
 
@@ -98,4 +113,5 @@ Action Input: {{"user": "{user_key}", "repo_name": "owner/repo"}}
         verbose=True
     )
 
-    return crew.kickoff()
+    with span("crew.kickoff", agent="github_rag"):
+        return crew.kickoff()
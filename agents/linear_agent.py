@@ -8,37 +8,48 @@ from tools.linear_tools import (
     linear_create_issue
 )
 from litellm_wrapper import LiteLLMWrapper
+from agents.async_runner import arun_agent
+from tracing import span
+
+from llm_cache import no_llm_cache
 
 gemini_llm = LiteLLMWrapper(model="gemini/gemini-2.5-flash")
 
-def run_linear_agent(query: str, user_key: str):
-    user_key = user_key.lower()
 
-    linear_ai = Agent(
-        role="Linear Assistant",
-        goal="Fetch project/task/issue data from Linear based on user query.",
-        backstory="Expert in Linear project management, tasks, states, and priorities.",
-        tools=[
-            linear_list_issues,
-            linear_in_progress,
-            linear_high_priority,
-            linear_teams,
-            linear_projects,
-            linear_create_issue
-        ],
-        verbose=False,
-        llm=gemini_llm
-    )
+LINEAR_AGENT = dict(
+    role="Linear Assistant",
+    goal="Fetch project/task/issue data from Linear based on user query.",
+    backstory="Expert in Linear project management, tasks, states, and priorities.",
+    tools=[
+        linear_list_issues,
+        linear_in_progress,
+        linear_high_priority,
+        linear_teams,
+        linear_projects,
+        linear_create_issue
+    ],
+)
+LINEAR_EXPECTED = "Just the Linear result, one line per item."
 
-    linear_task = Task(
-        description=f"""
+
+def _linear_task(query: str, user_key: str) -> str:
+    return f"""
 User query: "{query}"
 Internal user key: {user_key}
 
 ⚠️ ALWAYS call Linear tools using "{user_key}"
-""",
+"""
+
+
+def run_linear_agent(query: str, user_key: str):
+    user_key = user_key.lower()
+
+    linear_ai = Agent(**LINEAR_AGENT, verbose=False, llm=gemini_llm)
+
+    linear_task = Task(
+        description=_linear_task(query, user_key),
         agent=linear_ai,
-        expected_output="Just the Linear result, one line per item.",
+        expected_output=LINEAR_EXPECTED,
         input={"query": query, "user": user_key}
     )
 
@@ -49,4 +60,15 @@ Internal user key: {user_key}
         verbose=True
     )
 
-    return crew.kickoff()
+    # The agent can write to Linear (linear_create_issue); a cached completion
+    # would skip or repeat the write, so its runs never use the cache
+    with span("crew.kickoff", agent="linear"), no_llm_cache():
+        return crew.kickoff()
+
+
+async def arun_linear_agent(query: str, user_key: str, **kwargs) -> str:
+    """Async counterpart of run_linear_agent; LLM turns don't hold a thread (see arun_agent)."""
+    user_key = user_key.lower()
+    with no_llm_cache():
+        return await arun_agent(gemini_llm, "linear", task=_linear_task(query, user_key),
+                                expected=LINEAR_EXPECTED, **LINEAR_AGENT, **kwargs)
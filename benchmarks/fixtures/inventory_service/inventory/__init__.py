@@ -0,0 +1 @@
+"""Stock-keeping service: items, stock levels, pricing and reorder alerts."""
@@ -0,0 +1,40 @@
+import json
+from http.server import BaseHTTPRequestHandler
+from inventory.auth import verify_request
+from inventory.pricing import line_total
+
+
+class InventoryHandler(BaseHTTPRequestHandler):
+    """Routes GET /stock/<sku> and POST /quote; POST bodies must be signed."""
+
+    store = None
+    secret = ""
+    tax_rate = 0.2
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.path.startswith("/stock/"):
+            return self._send(404, {"error": "not found"})
+        level = self.store.stock(self.path[len("/stock/"):])
+        if level is None:
+            return self._send(404, {"error": "unknown sku"})
+        self._send(200, {"sku": level.sku, "available": level.available})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not verify_request(self.secret, body, self.headers.get("X-Signature")):
+            return self._send(401, {"error": "bad signature"})
+        if self.path != "/quote":
+            return self._send(404, {"error": "not found"})
+        order = json.loads(body)
+        item = self.store.get_item(order["sku"])
+        if item is None:
+            return self._send(404, {"error": "unknown sku"})
+        self._send(200, {"total": line_total(item.unit_price, order["quantity"], self.tax_rate)})
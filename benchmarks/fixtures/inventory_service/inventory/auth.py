@@ -0,0 +1,11 @@
+import hmac
+import hashlib
+
+
+def sign(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_request(secret: str, body: bytes, signature: str) -> bool:
+    """Checks the HMAC-SHA256 signature of a request body in constant time."""
+    return hmac.compare_digest(sign(secret, body), signature or "")
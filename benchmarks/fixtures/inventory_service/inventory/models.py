@@ -0,0 +1,23 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass
+class Item:
+    sku: str
+    name: str
+    unit_price: float
+    category: str = "general"
+
+
+@dataclass
+class StockLevel:
+    sku: str
+    on_hand: int
+    reserved: int = 0
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def available(self) -> int:
+        """Units that can still be sold: on hand minus those reserved by open orders."""
+        return max(0, self.on_hand - self.reserved)
@@ -0,0 +1,15 @@
+# Volume discount tiers: (minimum quantity, discount fraction), highest first
+DISCOUNT_TIERS = [(100, 0.15), (50, 0.10), (10, 0.05)]
+
+
+def volume_discount(quantity: int) -> float:
+    for minimum, discount in DISCOUNT_TIERS:
+        if quantity >= minimum:
+            return discount
+    return 0.0
+
+
+def line_total(unit_price: float, quantity: int, tax_rate: float) -> float:
+    """Price of an order line after the volume discount, with tax added and rounded to cents."""
+    subtotal = unit_price * quantity * (1 - volume_discount(quantity))
+    return round(subtotal * (1 + tax_rate), 2)
@@ -0,0 +1,14 @@
+import math
+
+
+def reorder_point(daily_demand: float, lead_time_days: int, safety_days: int) -> int:
+    """Stock level at which a new purchase order should be placed."""
+    return math.ceil(daily_demand * (lead_time_days + safety_days))
+
+
+def low_stock_alerts(levels, demand: dict, lead_time_days: int, safety_days: int):
+    """Yields (sku, available, reorder point) for every item at or below its reorder point."""
+    for level in levels:
+        point = reorder_point(demand.get(level.sku, 0.0), lead_time_days, safety_days)
+        if level.available <= point:
+            yield level.sku, level.available, point
@@ -0,0 +1,48 @@
+import sqlite3
+from inventory.models import Item, StockLevel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (sku TEXT PRIMARY KEY, name TEXT, unit_price REAL, category TEXT);
+CREATE TABLE IF NOT EXISTS stock (sku TEXT PRIMARY KEY REFERENCES items(sku), on_hand INTEGER, reserved INTEGER);
+"""
+
+
+class InventoryStore:
+    """SQLite-backed persistence for items and their stock levels."""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def add_item(self, item: Item, on_hand: int = 0):
+        with self.db:
+            self.db.execute("INSERT INTO items VALUES (?, ?, ?, ?)",
+                            (item.sku, item.name, item.unit_price, item.category))
+            self.db.execute("INSERT INTO stock VALUES (?, ?, 0)", (item.sku, on_hand))
+
+    def get_item(self, sku: str):
+        row = self.db.execute("SELECT sku, name, unit_price, category FROM items WHERE sku = ?", (sku,)).fetchone()
+        return Item(*row) if row else None
+
+    def stock(self, sku: str):
+        row = self.db.execute("SELECT sku, on_hand, reserved FROM stock WHERE sku = ?", (sku,)).fetchone()
+        return StockLevel(*row) if row else None
+
+    def adjust_stock(self, sku: str, delta: int):
+        """Adds delta units (negative to remove); refuses to go below zero."""
+        with self.db:
+            cur = self.db.execute("UPDATE stock SET on_hand = on_hand + ? WHERE sku = ? AND on_hand + ? >= 0",
+                                  (delta, sku, delta))
+            if cur.rowcount == 0:
+                raise ValueError(f"Cannot adjust {sku} by {delta}")
+
+    def reserve(self, sku: str, quantity: int):
+        """Holds units for an open order so they are no longer available."""
+        with self.db:
+            cur = self.db.execute("UPDATE stock SET reserved = reserved + ? "
+                                  "WHERE sku = ? AND on_hand - reserved >= ?", (quantity, sku, quantity))
+            if cur.rowcount == 0:
+                raise ValueError(f"Not enough {sku} available to reserve {quantity}")
+
+    def all_stock(self):
+        return [StockLevel(*row) for row in self.db.execute("SELECT sku, on_hand, reserved FROM stock")]
@@ -0,0 +1,42 @@
+const fs = require('fs');
+const path = require('path');
+
+// Notes live in one JSON file; writes go to a temp file renamed into place
+class NoteStore {
+  constructor(file) {
+    this.file = file;
+    this.notes = fs.existsSync(file) ? JSON.parse(fs.readFileSync(file, 'utf8')) : {};
+  }
+
+  get(id) {
+    return this.notes[id] || null;
+  }
+
+  list() {
+    return Object.values(this.notes).sort((a, b) => b.updatedAt - a.updatedAt);
+  }
+
+  // Last writer wins unless the stored note is newer, which is reported as a conflict
+  put(note) {
+    const existing = this.notes[note.id];
+    if (existing && existing.updatedAt > note.updatedAt) {
+      return { conflict: true, note: existing };
+    }
+    this.notes[note.id] = note;
+    this.save();
+    return { conflict: false, note };
+  }
+
+  delete(id) {
+    delete this.notes[id];
+    this.save();
+  }
+
+  save() {
+    const tmp = path.join(path.dirname(this.file), `.${path.basename(this.file)}.tmp`);
+    fs.writeFileSync(tmp, JSON.stringify(this.notes));
+    fs.renameSync(tmp, this.file);
+  }
+}
+
+module.exports = { NoteStore };
@@ -0,0 +1,49 @@
+const http = require('http');
+const { NoteStore } = require('./db');
+
+const store = new NoteStore(process.env.NOTES_FILE || 'notes.json');
+
+function readJson(req) {
+  return new Promise((resolve, reject) => {
+    let body = '';
+    req.on('data', (chunk) => (body += chunk));
+    req.on('end', () => {
+      try {
+        resolve(JSON.parse(body || '{}'));
+      } catch (err) {
+        reject(err);
+      }
+    });
+  });
+}
+
+function send(res, status, payload) {
+  res.writeHead(status, { 'Content-Type': 'application/json' });
+  res.end(JSON.stringify(payload));
+}
+
+// REST routes: GET /api/notes, GET|PUT|DELETE /api/notes/:id
+const server = http.createServer(async (req, res) => {
+  const match = req.url.match(/^\/api\/notes(?:\/([\w-]+))?$/);
+  if (!match) return send(res, 404, { error: 'not found' });
+  const id = match[1];
+
+  if (req.method === 'GET' && !id) return send(res, 200, store.list());
+  if (req.method === 'GET') {
+    const note = store.get(id);
+    return note ? send(res, 200, note) : send(res, 404, { error: 'unknown note' });
+  }
+  if (req.method === 'PUT' && id) {
+    const body = await readJson(req).catch(() => null);
+    if (!body) return send(res, 400, { error: 'invalid json' });
+    const result = store.put({ ...body, id });
+    return send(res, result.conflict ? 409 : 200, result.note);
+  }
+  if (req.method === 'DELETE' && id) {
+    store.delete(id);
+    return send(res, 204, {});
+  }
+  send(res, 405, { error: 'method not allowed' });
+});
+
+server.listen(process.env.PORT || 3000);
@@ -0,0 +1,23 @@
+import { renderMarkdown } from './render.js';
+import { enqueueChange } from './sync.js';
+
+const AUTOSAVE_DELAY_MS = 800;
+
+// Wires a textarea to a live preview and saves edits once typing pauses
+export function createEditor(textarea, preview, noteId) {
+  let timer = null;
+
+  textarea.addEventListener('input', () => {
+    preview.innerHTML = renderMarkdown(textarea.value);
+    clearTimeout(timer);
+    timer = setTimeout(() => {
+      enqueueChange({ id: noteId, body: textarea.value, updatedAt: Date.now() });
+    }, AUTOSAVE_DELAY_MS);
+  });
+
+  return {
+    destroy() {
+      clearTimeout(timer);
+    },
+  };
+}
@@ -0,0 +1,27 @@
+function escapeHtml(text) {
+  return text
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;');
+}
+
+// Minimal markdown: headings, bold, italics, inline code and paragraphs.
+// Input is escaped first so note content can never inject HTML.
+export function renderMarkdown(source) {
+  return escapeHtml(source)
+    .split(/\n{2,}/)
+    .map((block) => {
+      const heading = block.match(/^(#{1,6})\s+(.*)$/);
+      if (heading) {
+        const level = heading[1].length;
+        return `<h${level}>${heading[2]}</h${level}>`;
+      }
+      const inline = block
+        .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')
+        .replace(/\*(.+?)\*/g, '<em>$1</em>')
+        .replace(/`(.+?)`/g, '<code>$1</code>');
+      return `<p>${inline}</p>`;
+    })
+    .join('\n');
+}
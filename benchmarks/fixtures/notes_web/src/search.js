@@ -0,0 +1,38 @@
+const STOP_WORDS = new Set(['the', 'a', 'an', 'and', 'or', 'of', 'to', 'in']);
+
+export function tokenize(text) {
+  return text
+    .toLowerCase()
+    .split(/[^a-z0-9]+/)
+    .filter((t) => t && !STOP_WORDS.has(t));
+}
+
+// Inverted index from token to the ids of notes containing it
+export class SearchIndex {
+  constructor() {
+    this.postings = new Map();
+  }
+
+  add(note) {
+    for (const token of new Set(tokenize(note.body))) {
+      if (!this.postings.has(token)) this.postings.set(token, new Set());
+      this.postings.get(token).add(note.id);
+    }
+  }
+
+  remove(noteId) {
+    for (const ids of this.postings.values()) ids.delete(noteId);
+  }
+
+  // Notes containing every query token (AND semantics)
+  search(query) {
+    const tokens = tokenize(query);
+    if (!tokens.length) return [];
+    let result = null;
+    for (const token of tokens) {
+      const ids = this.postings.get(token) || new Set();
+      result = result ? new Set([...result].filter((id) => ids.has(id))) : new Set(ids);
+    }
+    return [...result];
+  }
+}
@@ -0,0 +1,51 @@
+const QUEUE_KEY = 'notes.pendingChanges';
+const MAX_BACKOFF_MS = 60000;
+
+function loadQueue() {
+  return JSON.parse(localStorage.getItem(QUEUE_KEY) || '[]');
+}
+
+function saveQueue(queue) {
+  localStorage.setItem(QUEUE_KEY, JSON.stringify(queue));
+}
+
+// Changes are queued in localStorage so edits made offline survive reloads
+export function enqueueChange(change) {
+  const queue = loadQueue().filter((c) => c.id !== change.id);
+  queue.push(change);
+  saveQueue(queue);
+  flushQueue();
+}
+
+let backoff = 1000;
+
+// Sends queued changes oldest first; on failure retries with exponential backoff
+export async function flushQueue() {
+  const queue = loadQueue();
+  while (queue.length) {
+    const change = queue[0];
+    try {
+      const res = await fetch(`/api/notes/${change.id}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(change),
+      });
+      if (res.status === 409) {
+        // Server has a newer version: keep theirs, drop ours
+        queue.shift();
+      } else if (!res.ok) {
+        throw new Error(`HTTP ${res.status}`);
+      } else {
+        queue.shift();
+      }
+      saveQueue(queue);
+      backoff = 1000;
+    } catch (err) {
+      setTimeout(flushQueue, backoff);
+      backoff = Math.min(backoff * 2, MAX_BACKOFF_MS);
+      return;
+    }
+  }
+}
+
+window.addEventListener('online', flushQueue);
@@ -0,0 +1,240 @@
+"""
+Offline benchmark for the GitHub RAG pipeline.
+
+Indexes local fixture repositories (no GitHub access), then replays a
+labelled question set through retrieval and GitHubQA.ask with a stubbed
+LLM. Fixtures live under benchmarks/fixtures and are pinned by tree SHA in
+the questions file, so runs stay comparable across commits; a fixture that
+no longer matches its pin is refused rather than measured. Reports
+ingestion throughput, query latency percentiles, peak RSS, index size on
+disk and recall@k as JSON so runs can be compared.
+
+Usage:
+    python benchmarks/rag_benchmark.py [--questions benchmarks/questions.json]
+                                       [--repeat 5] [--output run.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import hashlib
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SKIP_DIRS = {".git", "__pycache__", "node_modules", ".venv", "venv", ".rag_index", ".traces", ".profiles"}
+RECALL_KS = (1, 3, 5, 10)
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """Stands in for the Gemini model: answers instantly, supports stream=True."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        from rag.chunker import estimate_tokens
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(prompt)
+        if stream:
+            return iter([StubResponse("stub "), StubResponse("answer")])
+        return StubResponse("stub answer")
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Same SHA GitHub reports for the blob, so incremental indexing behaves as in production."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def list_local_tree(path: str) -> dict:
+    from rag.fetcher import TreeEntry, is_indexable
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith("."))
+        for name in sorted(filenames):
+            full = os.path.join(dirpath, name)
+            rel = os.path.relpath(full, path).replace(os.sep, "/")
+            size = os.path.getsize(full)
+            if is_indexable(rel, size):
+                with open(full, "rb") as f:
+                    tree[rel] = TreeEntry(rel, git_blob_sha(f.read()), size)
+    return tree
+
+
+def fetch_local(path: str):
+    from rag.fetcher import _decode
+
+    def fetch(entries):
+        for entry in entries:
+            with open(os.path.join(path, entry.path), "rb") as f:
+                text = _decode(f.read())
+            if text is not None:
+                yield entry, text
+    return fetch
+
+
+def tree_sha(tree: dict) -> str:
+    return hashlib.sha1("".join(f"{p}:{e.sha}\n" for p, e in sorted(tree.items())).encode()).hexdigest()
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def latency_summary(samples) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {"p50_ms": percentile(ms, 50), "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99), "mean_ms": sum(ms) / len(ms) if ms else 0.0, "samples": len(ms)}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def benchmark_fixture(name: str, path: str, questions, repeat: int, index_dir: str, pinned: str = None) -> dict:
+    from tools.github_rag import GitHubQA
+    from rag.context import pack_context
+
+    tree = list_local_tree(path)
+    if pinned and tree_sha(tree) != pinned:
+        raise SystemExit(f"Fixture {name} does not match its pinned tree {pinned[:12]} "
+                         f"(found {tree_sha(tree)[:12]}); recall labels may no longer apply")
+    qa = GitHubQA(None, None, model=StubModel())
+    qa.attach_index(f"local/{name}", tree_sha(tree))
+
+    start = time.perf_counter()
+    stats = qa.sync_index(lambda: tree, fetch_local(path), on_progress=lambda s: None)
+    ingest_seconds = time.perf_counter() - start
+
+    retrieval, asks = [], []
+    recall = {k: [] for k in RECALL_KS}
+    for item in questions:
+        question, expected = item["question"], set(item["expected"])
+
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            qemb = qa.embedder.encode([question])[0].tolist()
+            results = qa.index.query(qemb, max(RECALL_KS))
+            pack_context(results["documents"][0], results["metadatas"][0])
+            retrieval.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            qa.ask(question)
+            asks.append(time.perf_counter() - t0)
+
+        ranked = []
+        for meta in results["metadatas"][0]:
+            if meta["file_path"] not in ranked:
+                ranked.append(meta["file_path"])
+        for k in RECALL_KS:
+            recall[k].append(len(expected & set(ranked[:k])) / len(expected))
+
+    return {
+        "fixture": name,
+        "tree_sha": tree_sha(tree),
+        "files": stats["files"],
+        "chunks": qa.index.count(),
+        "backend": qa.index.backend,
+        "ingest": {
+            "seconds": ingest_seconds,
+            "files_per_s": stats["files"] / ingest_seconds if ingest_seconds else 0.0,
+            "chunks_per_s": stats["chunks"] / ingest_seconds if ingest_seconds else 0.0,
+        },
+        "retrieval_latency": latency_summary(retrieval),
+        "ask_latency": latency_summary(asks),
+        "recall": {f"recall@{k}": sum(v) / len(v) if v else 0.0 for k, v in recall.items()},
+        "avg_prompt_tokens": qa.model.prompt_tokens / qa.model.calls if qa.model.calls else 0,
+        "index_bytes": dir_size(index_dir),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=os.path.join(ROOT, "benchmarks", "questions.json"))
+    parser.add_argument("--repeat", type=int, default=5, help="query repetitions per question")
+    parser.add_argument("--output", help="write the JSON report to this file as well as stdout")
+    parser.add_argument("--answer-cache", action="store_true", help="leave the semantic answer cache enabled")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    # Fresh index and embedding cache so every run measures cold ingestion
+    os.environ["RAG_INDEX_DIR"] = os.path.join(work_dir, "index")
+    os.environ["RAG_EMBED_CACHE_DIR"] = os.path.join(work_dir, "embedding_cache")
+    # Span export would add its own I/O to every timing
+    os.environ["TRACING_ENABLED"] = "0"
+
+    from rag.answer_cache import answer_cache
+    from rag import chunker, context, vector_store
+    if not args.answer_cache:
+        answer_cache.max_entries = 0
+
+    base = os.path.dirname(os.path.abspath(args.questions))
+    results = []
+    for name, fixture in spec["fixtures"].items():
+        path = os.path.normpath(os.path.join(base, fixture["path"]))
+        results.append(benchmark_fixture(name, path, fixture["questions"], args.repeat,
+                                         os.environ["RAG_INDEX_DIR"], fixture.get("tree_sha")))
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "config": {
+            "chunk_max_tokens": chunker.CHUNK_MAX_TOKENS,
+            "chunker": chunker.CHUNKER_VERSION,
+            "context_tokens": context.CONTEXT_TOKEN_BUDGET,
+            "numpy_max_chunks": vector_store.NUMPY_MAX_CHUNKS,
+            "numpy_dtype": vector_store.NUMPY_DTYPE,
+            "repeat": args.repeat,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "fixtures": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,183 @@
 from langchain_core.language_models.llms import LLM
-from typing import Optional, List
-from litellm import completion
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk
+from typing import Any, AsyncIterator, Iterator, Optional, List
+from litellm import completion, acompletion
 from dotenv import load_dotenv
 from pydantic import Field
+from llm_cache import llm_cache
+from tracing import traced
+from metrics import LLM_CALLS, record_llm_call
+import asyncio
+import random
+import time
 import os
-import json
 
 load_dotenv()
 
+# HTTP statuses worth another attempt: timeouts, rate limits and server-side failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMCallError(Exception):
+    """A LiteLLM call that failed for good, after any retries."""
+
+    def __init__(self, model: str, message: str, status_code: Optional[int] = None, attempts: int = 1):
+        super().__init__(f"{model} failed after {attempts} attempt(s): {message}")
+        self.model = model
+        self.status_code = status_code
+        self.attempts = attempts
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code in RETRYABLE_STATUS
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    status = getattr(e, "status_code", None)
+    if status is None and "timeout" in type(e).__name__.lower():
+        return 408
+    return status
+
+
 class LiteLLMWrapper(LLM):
     model: str = Field(default="gemini/gemini-2.5-flash")
+    timeout: float = Field(default=float(os.getenv("LITELLM_TIMEOUT_S", "60")))
+    max_retries: int = Field(default=int(os.getenv("LITELLM_MAX_RETRIES", "2")))
+    backoff_base: float = Field(default=float(os.getenv("LITELLM_BACKOFF_BASE_S", "0.5")))
+    backoff_max: float = Field(default=float(os.getenv("LITELLM_BACKOFF_MAX_S", "8")))
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+    def _messages(self, prompt: str):
         """
         This wrapper allows CrewAI to talk to Gemini via LiteLLM.
         CrewAI sends prompt as ONE string → we wrap as user message.
         """
-
         # Structure messages for models that expect system+user messages
-        messages = [
+        return [
             {"role": "system", "content": "You are a helpful AI assistant. Follow tool instructions strictly."},
             {"role": "user", "content": prompt}
         ]
 
-        try:
-            response = completion(
-                model=self.model,
-                messages=messages
-            )
+    def _retry_delay(self, e: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the error is final."""
+        if attempt > self.max_retries or _status_code(e) not in RETRYABLE_STATUS:
+            return None
+        # Full jitter keeps concurrent agents from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _record(self, response, start: float):
+        usage = getattr(response, "usage", None)
+        record_llm_call(self.model, time.monotonic() - start, "ok",
+                        getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+
+    def _error(self, e: Exception, attempt: int) -> LLMCallError:
+        return LLMCallError(self.model, str(e), _status_code(e), attempt)
+
+    @traced("llm.litellm")
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        messages = self._messages(prompt)
+        cached = llm_cache.get(self.model, messages)
+        if cached is not None:
+            LLM_CALLS.inc(model=self.model, outcome="cached")
+            return cached
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = completion(model=self.model, messages=messages, timeout=self.timeout)
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    record_llm_call(self.model, time.monotonic() - start, "error")
+                    raise self._error(e, attempt) from e
+                time.sleep(delay)
+
+        self._record(response, start)
+        # Extract output
+        content = response["choices"][0]["message"]["content"]
+        llm_cache.put(self.model, messages, content)
+        return content
+
+    @traced("llm.litellm")
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None,
+                     run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        messages = self._messages(prompt)
+        cached = llm_cache.get(self.model, messages)
+        if cached is not None:
+            LLM_CALLS.inc(model=self.model, outcome="cached")
+            return cached
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await acompletion(model=self.model, messages=messages, timeout=self.timeout)
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    record_llm_call(self.model, time.monotonic() - start, "error")
+                    raise self._error(e, attempt) from e
+                await asyncio.sleep(delay)
+
+        self._record(response, start)
+        content = response["choices"][0]["message"]["content"]
+        llm_cache.put(self.model, messages, content)
+        return content
 
-            # Extract output
-            content = response["choices"][0]["message"]["content"]
-            return content
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        """Yields content as it arrives. Only failures before the first chunk are retried."""
+        messages = self._messages(prompt)
+        attempt = 0
+        started = False
+        while True:
+            attempt += 1
+            try:
+                for part in completion(model=self.model, messages=messages, timeout=self.timeout, stream=True):
+                    text = part.choices[0].delta.content
+                    if not text:
+                        continue
+                    started = True
+                    chunk = GenerationChunk(text=text)
+                    if run_manager:
+                        run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._error(e, attempt) from e
+                time.sleep(delay)
 
-        except Exception as e:
-            return f"[LiteLLMWrapper Error]: {str(e)}"
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        messages = self._messages(prompt)
+        attempt = 0
+        started = False
+        while True:
+            attempt += 1
+            try:
+                response = await acompletion(model=self.model, messages=messages, timeout=self.timeout, stream=True)
+                async for part in response:
+                    text = part.choices[0].delta.content
+                    if not text:
+                        continue
+                    started = True
+                    chunk = GenerationChunk(text=text)
+                    if run_manager:
+                        await run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._error(e, attempt) from e
+                await asyncio.sleep(delay)
 
     def supports_stop_words(self) -> bool:
         return False
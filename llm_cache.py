@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from metrics import register_cache
+
+# Opt-in: replaying completions is only safe for prompts whose answer doesn't change
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".llm_cache", "completions.sqlite"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_bypass = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def no_llm_cache():
+    """Completions requested inside this block neither read nor fill the cache."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cache_key(model: str, messages) -> str:
+    """Hash of the model and its messages, with whitespace differences normalised away."""
+    normalised = [[m["role"], re.sub(r"\s+", " ", str(m["content"])).strip()] for m in messages]
+    payload = json.dumps([model, normalised], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    SQLite-backed cache of LLM completions keyed by (model, normalised messages).
+
+    Entries expire after a TTL; past max_entries the least recently used are
+    evicted. Lookups inside no_llm_cache() are skipped, for non-idempotent flows.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, enabled: bool = LLM_CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and not _bypass.get()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Caller holds self._lock
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS completions "
+                             "(key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions(last_used)")
+            self._db.commit()
+        return self._db
+
+    def get(self, model: str, messages):
+        """Returns the cached completion text, or None on a miss (or when inactive)."""
+        if not self.active:
+            return None
+        key = cache_key(model, messages)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT response, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl:
+                db.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+                db.commit()
+                self.hits += 1
+                return row[0]
+            if row:
+                db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, model: str, messages, response: str):
+        if not self.active or not response:
+            return
+        key = cache_key(model, messages)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                       (key, model, response, now, now))
+            excess = db.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute("DELETE FROM completions WHERE key IN "
+                           "(SELECT key FROM completions ORDER BY last_used LIMIT ?)", (excess,))
+            db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+llm_cache = CompletionCache()
+register_cache("llm_completions", llm_cache.stats)
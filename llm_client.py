@@ -1,33 +1,278 @@
-# import os
-# import google.generativeai as genai
-# import json
-
-# genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# def call_llm(system_prompt: str, user_query: str) -> dict:
-#     """
-#     Routes query via Gemini → returns JSON dict
-#     """
-
-#     model = genai.GenerativeModel("gemini-2.0-flash")
-
-#     try:
-#         response = model.generate_content(
-#             [
-#                 {"role": "system", "parts": system_prompt},
-#                 {"role": "user", "parts": user_query}
-#             ]
-#         )
-
-#         text = response.text.strip()
-
-#         # Try parsing JSON strictly
-#         try:
-#             return json.loads(text)
-#         except Exception as e:
-#             print("⚠️ Non-JSON response from model:", text)
-#             return {"agent": "none", "user": "unknown"}
-
-#     except Exception as e:
-#         print(f"❌ Gemini error: {e}")
-#         return {"agent": "none", "user": "unknown"}
+import os
+import time
+import random
+import threading
+from collections import deque
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from tracing import span
+from metrics import record_llm_call
+from profiling import profiled_thread
+
+# -------------------- Configuration --------------------
+genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+# Overall deadline per generate_content call, retries and hedges included
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "4"))
+# Hedging: a second identical request fires once the first outlives the p95 latency.
+# Off by default since it can double the spend; callers opt in per call (the router does)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Circuit breaker: this many consecutive failures open it for LLM_CIRCUIT_RESET_S
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET_S = float(os.getenv("LLM_CIRCUIT_RESET_S", "30"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+
+# Transient errors worth retrying (and counting against the circuit breaker)
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+)
+
+_executor = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="gemini")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failures` transient errors in a
+    row it opens and rejects calls for `reset_s`; then one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit. The
+    caller must end every allowed call with record_success(), record_failure()
+    or release(), so a trial can't be left hanging.
+    """
+
+    def __init__(self, failures: int = LLM_CIRCUIT_FAILURES, reset_s: float = LLM_CIRCUIT_RESET_S):
+        self.failures = failures
+        self.reset_s = reset_s
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = None   # thread running the half-open trial call
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_s else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_s or self._trial is not None:
+                return False
+            self._trial = threading.get_ident()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial is not None or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = None
+
+    def release(self):
+        """Ends the calling thread's trial, if it still holds one, without a verdict."""
+        with self._lock:
+            if self._trial == threading.get_ident():
+                self._trial = None
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies, for the hedge delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float):
+        with self._lock:
+            if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class ResilientModel:
+    """
+    Long-lived wrapper around one genai.GenerativeModel.
+
+    generate_content() keeps the GenerativeModel interface but enforces an
+    overall deadline, hedges slow calls with a second request after the p95
+    latency (first response wins), retries transient errors with jittered
+    exponential backoff and fails fast with CircuitOpenError while Gemini is
+    degraded. Streaming calls get the deadline and the breaker only, since a
+    stream can't be retried once tokens have been handed out.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.model = genai.GenerativeModel(name)
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                      "timeouts": 0, "failures": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _call(self, prompt, timeout: float, kwargs: dict):
+        start = time.monotonic()
+        with profiled_thread():
+            response = self.model.generate_content(prompt, request_options={"timeout": timeout}, **kwargs)
+        self.latency.add(time.monotonic() - start)
+        return response
+
+    def generate_content(self, prompt, stream: bool = False, timeout: float = LLM_TIMEOUT_S,
+                         retries: int = LLM_MAX_RETRIES, hedge: bool = LLM_HEDGE_ENABLED, **kwargs):
+        start = time.monotonic()
+        outcome = "error"
+        usage = None
+        try:
+            with span("llm.gemini", model=self.name, stream=stream):
+                response = self._generate(prompt, stream, timeout, retries, hedge, kwargs)
+            outcome = "ok"
+            # Streams report usage only once consumed; token counts cover unary calls
+            usage = None if stream else getattr(response, "usage_metadata", None)
+            return response
+        except CircuitOpenError:
+            outcome = "rejected"
+            raise
+        finally:
+            record_llm_call(self.name, time.monotonic() - start, outcome,
+                            getattr(usage, "prompt_token_count", None),
+                            getattr(usage, "candidates_token_count", None))
+
+    def _generate(self, prompt, stream: bool, timeout: float, retries: int, hedge: bool, kwargs: dict):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"Gemini circuit open for {self.name}")
+        self._count("calls")
+        try:
+            return self._generate_admitted(prompt, stream, timeout, retries, hedge, kwargs)
+        except RETRYABLE_ERRORS:
+            raise
+        except Exception:
+            # Gemini answered, just not usefully (bad argument, permission, parsing):
+            # that says nothing against its availability
+            self.breaker.record_success()
+            raise
+        finally:
+            self.breaker.release()
+
+    def _generate_admitted(self, prompt, stream: bool, timeout: float, retries: int, hedge: bool, kwargs: dict):
+        if stream:
+            try:
+                response = self.model.generate_content(prompt, stream=True,
+                                                       request_options={"timeout": timeout}, **kwargs)
+            except RETRYABLE_ERRORS:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return response
+
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            try:
+                response = self._attempt(prompt, deadline, hedge, kwargs)
+                self.breaker.record_success()
+                return response
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                remaining = deadline - time.monotonic()
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * 2 ** attempt))
+                if attempt >= retries or backoff >= remaining or not self.breaker.allow():
+                    self._count("failures")
+                    raise
+                attempt += 1
+                self._count("retries")
+                print(f"⚠️ Gemini {self.name} {type(e).__name__}, retry {attempt} in {backoff:.2f}s")
+                time.sleep(backoff)
+
+    def _attempt(self, prompt, deadline: float, hedge: bool, kwargs: dict):
+        """One logical attempt: the primary request plus, if it is slow, a hedge."""
+        remaining = deadline - time.monotonic()
+        futures = [_executor.submit(copy_context().run, self._call, prompt, remaining, kwargs)]
+
+        delay = self.latency.percentile(LLM_HEDGE_PERCENTILE) if hedge else None
+        if delay is not None and delay < remaining:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                self._count("hedges")
+                futures.append(_executor.submit(copy_context().run, self._call, prompt,
+                                                deadline - time.monotonic(), kwargs))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = error or future.exception()
+
+        if pending:
+            # Losers keep running until their own request timeout; nobody waits for them
+            self._count("timeouts")
+            raise TimeoutError(f"Gemini {self.name} did not answer within the deadline")
+        raise error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["p95_s"] = self.latency.percentile(95)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+# -------------------- Shared Models --------------------
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(name: str) -> ResilientModel:
+    """Returns the process-wide model for `name`, created on first use."""
+    with _models_lock:
+        if name not in _models:
+            _models[name] = ResilientModel(name)
+        return _models[name]
+
+
+def llm_stats() -> dict:
+    with _models_lock:
+        models = dict(_models)
+    return {name: m.snapshot() for name, m in models.items()}
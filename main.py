@@ -381,8 +381,14 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from fastapi.staticfiles import StaticFiles
 import os
+import threading
 from routes.query_router import router  # importing your APIRouter instance
+from router_logic.intent_classifier import intent_classifier
 from starlette.middleware.sessions import SessionMiddleware
+from fastapi import Request
+from fastapi.responses import Response
+from tracing import span, new_trace_id, TRACING_ENABLED
+from metrics import registry, CONTENT_TYPE
 
 app = FastAPI()
 
@@ -396,11 +402,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Trace every request; clients may pass their own X-Trace-Id to correlate
+if TRACING_ENABLED:
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        trace_id = request.headers.get("X-Trace-Id") or new_trace_id()
+        with span(f"{request.method} {request.url.path}", trace_id=trace_id) as current:
+            response = await call_next(request)
+            current.set(status_code=response.status_code)
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+
 # Root path
 # @app.get("/")
 # def root():
 #     return {"message": "Welcome to ShopBuddyAI! Use the /api/query or /api/products endpoints."}
 
+# Embed the routing exemplars while the server starts rather than on the first query
+@app.on_event("startup")
+def warm_intent_classifier():
+    threading.Thread(target=intent_classifier.warm, name="warm-intent-classifier", daemon=True).start()
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 # Include all APIs under /api
 app.include_router(router, prefix="/api")
 # -----------------------------
@@ -0,0 +1,227 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge or counter whose values are read from `callback` at scrape time.
+    The callback returns a number (no labels) or {label value tuple: number}.
+    """
+
+    def __init__(self, name: str, help: str, callback, labels=(), type: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.callback = callback
+        self.type = type
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} unavailable:", e)
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.label_names, k if isinstance(k, tuple) else (k,))} {_number(v)}"
+                for k, v in values.items() if v is not None]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(c), s) for k, (c, s) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering a name (e.g. on module reload) returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, callback, labels=(), type: str = "gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, help, callback, labels, type))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# -------------------- Shared Metrics --------------------
+QUERY_REQUESTS = registry.counter(
+    "query_requests_total", "Queries handled, by routed agent and outcome.", ("agent", "outcome"))
+QUERY_LATENCY = registry.histogram(
+    "query_duration_seconds", "End-to-end query latency by routed agent.", ("agent",))
+LLM_CALLS = registry.counter(
+    "llm_calls_total", "LLM calls by model and outcome.", ("model", "outcome"))
+LLM_LATENCY = registry.histogram(
+    "llm_call_duration_seconds", "LLM call latency by model, retries and hedges included.", ("model",))
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "LLM tokens by model and kind (prompt or completion).", ("model", "kind"))
+GITHUB_RATE_LIMIT = registry.gauge(
+    "github_rate_limit_remaining", "GitHub API requests left in the current window, per user token.", ("user",))
+
+
+def record_llm_call(model: str, seconds: float, outcome: str = "ok",
+                    prompt_tokens: int = None, completion_tokens: int = None):
+    LLM_CALLS.inc(model=model, outcome=outcome)
+    LLM_LATENCY.observe(seconds, model=model)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+
+# -------------------- Cache Hit Ratios --------------------
+_cache_stats = {}
+
+
+def register_cache(name: str, stats_fn):
+    """Exposes a cache's stats() (with hits and misses) as hit ratio and lookup counters."""
+    _cache_stats[name] = stats_fn
+
+
+def _collect_caches():
+    collected = {}
+    for name, stats_fn in list(_cache_stats.items()):
+        stats = stats_fn()
+        if stats is not None:
+            collected[name] = stats
+    return collected
+
+
+def _cache_hit_ratios():
+    return {(name,): s["hits"] / ((s["hits"] + s["misses"]) or 1) for name, s in _collect_caches().items()}
+
+
+def _cache_lookups():
+    values = {}
+    for name, s in _collect_caches().items():
+        values[(name, "hit")] = s["hits"]
+        values[(name, "miss")] = s["misses"]
+    return values
+
+
+registry.callback("cache_hit_ratio", "Hit ratio of each cache since start.", _cache_hit_ratios, ("cache",))
+registry.callback("cache_lookups_total", "Cache lookups by cache and result.", _cache_lookups,
+                  ("cache", "result"), type="counter")
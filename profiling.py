@@ -0,0 +1,132 @@
+import os
+import sys
+import hmac
+import uuid
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Profiling is off unless a token is configured; requests must present it to be profiled
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Sampling stops on its own after this long, whatever the request is doing
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+
+_active_profile = ContextVar("active_profile", default=None)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class RequestProfiler:
+    """
+    Sampling profiler for the threads working on one request.
+
+    A background thread wakes every interval and records the stack of each
+    attached thread, via sys._current_frames(). Stacks are written in the
+    collapsed format ("root;...;leaf count" per line) that flamegraph.pl and
+    speedscope read directly.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS,
+                 out_dir: str = PROFILE_DIR):
+        self.id = uuid.uuid4().hex[:12]
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.path = os.path.join(out_dir, f"{self.id}.collapsed")
+        self.samples = 0
+        self._stacks = Counter()
+        self._threads = {}   # thread id -> attach count
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+        return self
+
+    def attach(self, thread_id: int):
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def detach(self, thread_id: int):
+        with self._lock:
+            if self._threads.get(thread_id, 0) <= 1:
+                self._threads.pop(thread_id, None)
+            else:
+                self._threads[thread_id] -= 1
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            with self._lock:
+                threads = list(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def stop(self) -> str:
+        """Stops sampling and writes the collapsed stacks. Returns the file path."""
+        self._stop.set()
+        self._sampler.join()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return self.path
+
+
+def profile_requested(headers, query_params) -> bool:
+    """True if the request carries the profiling token in X-Profile or ?profile=."""
+    if not PROFILE_TOKEN:
+        return False
+    supplied = headers.get("X-Profile") or query_params.get("profile") or ""
+    return hmac.compare_digest(supplied.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+@contextmanager
+def request_profile(enabled: bool):
+    """
+    Profiles the enclosed request handling when enabled, yielding the profiler
+    (or None). Threads doing work for the request attach via profiled_thread().
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = RequestProfiler().start()
+    token = _active_profile.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active_profile.reset(token)
+        path = profiler.stop()
+        print(f"📈 Profile {profiler.id}: {profiler.samples} samples written to {path}")
+
+
+@contextmanager
+def profiled_thread():
+    """Attaches the current thread to the request's profiler, if one is active."""
+    profiler = _active_profile.get()
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profiler.attach(thread_id)
+    try:
+        yield
+    finally:
+        profiler.detach(thread_id)
@@ -0,0 +1,97 @@
+import os
+import time
+import itertools
+import threading
+from collections import OrderedDict
+import numpy as np
+from metrics import register_cache
+
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "86400"))
+# Minimum cosine similarity between question embeddings to reuse an answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.92"))
+
+
+class AnswerCache:
+    """
+    Semantic cache of RAG answers keyed by repo, commit SHA and question embedding.
+
+    A lookup returns the answer of the most similar cached question for the
+    same repo@SHA if its cosine similarity clears the threshold. Entries
+    expire after a TTL, the least recently used are evicted past max_entries,
+    and all entries of a repo are dropped as soon as it is seen at a new SHA.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()   # entry id -> dict, oldest use first
+        self._repo_sha = {}             # repo -> SHA the cached answers belong to
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _sync_sha(self, repo: str, sha: str):
+        if self._repo_sha.get(repo, sha) != sha:
+            stale = [k for k, e in self._entries.items() if e["repo"] == repo]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+        self._repo_sha[repo] = sha
+
+    def _expire(self, now: float):
+        for k in [k for k, e in self._entries.items() if now - e["created"] > self.ttl]:
+            del self._entries[k]
+
+    def lookup(self, repo: str, sha: str, embedding):
+        """Returns a cached answer for a sufficiently similar question, or None."""
+        repo = repo.lower()
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        with self._lock:
+            self._sync_sha(repo, sha)
+            self._expire(time.time())
+
+            candidates = [(k, e) for k, e in self._entries.items() if e["repo"] == repo]
+            if candidates:
+                sims = np.stack([e["embedding"] for _, e in candidates]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, repo: str, sha: str, embedding, question: str, answer: str):
+        repo = repo.lower()
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        with self._lock:
+            self._sync_sha(repo, sha)
+            self._entries[next(self._ids)] = {"repo": repo, "embedding": q, "question": question,
+                                              "answer": answer, "created": time.time()}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+        }
+
+
+answer_cache = AnswerCache()
+register_cache("rag_answers", answer_cache.stats)
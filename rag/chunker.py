@@ -0,0 +1,217 @@
+import os
+import re
+import ast
+from collections import namedtuple
+
+# Chunk size limits in (approximate) tokens; MiniLM truncates input past 256 word pieces
+CHUNK_MAX_TOKENS = int(os.getenv("RAG_CHUNK_MAX_TOKENS", "256"))
+
+# Bump whenever chunk boundaries change so existing indexes get rebuilt
+CHUNKER_VERSION = "structure-v1"
+
+Chunk = namedtuple("Chunk", ["text", "start_line", "end_line", "symbol"])
+
+# A block is a 1-based inclusive line range that should stay together if it fits
+Block = namedtuple("Block", ["start", "end", "symbol"])
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: words plus punctuation marks."""
+    return len(_TOKEN_RE.findall(text))
+
+
+# -------------------- Splitters --------------------
+def split_python(lines, max_tokens):
+    """Top-level functions/classes via ast; oversized classes are split per method."""
+    try:
+        tree = ast.parse("".join(lines))
+    except (SyntaxError, ValueError):
+        return split_braces(lines, max_tokens)
+
+    blocks = []
+    prev_end = 0
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        end = node.end_lineno
+        symbol = getattr(node, "name", "")
+
+        if isinstance(node, ast.ClassDef) and _tokens(lines, start, end) > max_tokens:
+            blocks.extend(_split_class(node, prev_end + 1, end))
+        else:
+            # Comments and blank lines above a definition belong to it
+            blocks.append(Block(prev_end + 1, end, symbol))
+        prev_end = end
+
+    if prev_end < len(lines):
+        blocks.append(Block(prev_end + 1, len(lines), ""))
+    return blocks
+
+
+def _split_class(node, start, end):
+    blocks = []
+    methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+    prev_end = start - 1
+    for m in methods:
+        m_start = min([m.lineno] + [d.lineno for d in m.decorator_list])
+        if m_start - 1 > prev_end and not blocks:
+            # Class header, docstring and attributes before the first method
+            blocks.append(Block(prev_end + 1, m_start - 1, node.name))
+            prev_end = m_start - 1
+        blocks.append(Block(prev_end + 1, m.end_lineno, f"{node.name}.{m.name}"))
+        prev_end = m.end_lineno
+    if prev_end < end:
+        blocks.append(Block(prev_end + 1, end, node.name))
+    return blocks
+
+
+_DEF_RE = re.compile(
+    r"^(?:export\s+|default\s+|public\s+|private\s+|protected\s+|internal\s+|static\s+|abstract\s+|"
+    r"final\s+|async\s+|pub(?:\([^)]*\))?\s+|unsafe\s+|extern\s+|inline\s+|virtual\s+)*"
+    r"(?:function\*?|class|interface|struct|enum|trait|impl|fn|func|def|type|module|namespace|"
+    r"const|let|var|void|int|char|bool|float|double|auto|template)\b"
+)
+_NAME_RE = re.compile(r"\b(?:function\*?|class|interface|struct|enum|trait|impl|fn|func|def|type|module|"
+                      r"namespace|const|let|var)\s+(?:\([^)]*\)\s*)?([A-Za-z_$][\w$]*)")
+_LEAD_RE = re.compile(r"^\s*(?://|/\*|\*|#|@|\[)")
+
+
+def split_braces(lines, max_tokens):
+    """
+    Heuristic splitter for C-like languages: a new block starts at a
+    definition-looking line at brace depth zero, together with the
+    comments/annotations directly above it.
+    """
+    starts = []
+    depth = 0
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if depth == 0 and stripped and not line[0].isspace() and _DEF_RE.match(stripped):
+            start = i
+            while start > 0 and _LEAD_RE.match(lines[start - 1]) and lines[start - 1].strip():
+                start -= 1
+            if not starts or start > starts[-1][0]:
+                name = _NAME_RE.search(stripped)
+                starts.append((start, name.group(1) if name else ""))
+        depth = max(0, depth + line.count("{") - line.count("}"))
+
+    if not starts:
+        return split_paragraphs(lines, max_tokens)
+
+    blocks = []
+    if starts[0][0] > 0:
+        blocks.append(Block(1, starts[0][0], ""))
+    for (start, symbol), nxt in zip(starts, starts[1:] + [(len(lines), "")]):
+        blocks.append(Block(start + 1, nxt[0], symbol))
+    return blocks
+
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)")
+
+
+def split_markdown(lines, max_tokens):
+    """Splits on headings (ignoring '#' inside fenced code blocks)."""
+    blocks = []
+    start, symbol, in_fence = 1, "", False
+    for i, line in enumerate(lines, start=1):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING_RE.match(line)
+        if heading and i > start:
+            blocks.append(Block(start, i - 1, symbol))
+            start = i
+        if heading:
+            symbol = heading.group(2).strip()
+    blocks.append(Block(start, len(lines), symbol))
+    return blocks
+
+
+def split_paragraphs(lines, max_tokens):
+    """Fallback: blank-line separated paragraphs."""
+    blocks = []
+    start = 1
+    for i, line in enumerate(lines, start=1):
+        if not line.strip() and i > start:
+            blocks.append(Block(start, i, ""))
+            start = i + 1
+    if start <= len(lines):
+        blocks.append(Block(start, len(lines), ""))
+    return blocks
+
+
+CHUNKERS = {
+    "py": split_python,
+    "md": split_markdown,
+}
+for _ext in ("js", "jsx", "ts", "tsx", "java", "cpp", "c", "h", "cs", "go", "rs", "php", "css", "sql"):
+    CHUNKERS[_ext] = split_braces
+
+
+def register_chunker(extensions, splitter):
+    """Plugs in a splitter(lines, max_tokens) -> [Block] for the given file extensions."""
+    for ext in extensions:
+        CHUNKERS[ext.lower().lstrip(".")] = splitter
+
+
+# -------------------- Packing --------------------
+def _tokens(lines, start, end):
+    return estimate_tokens("".join(lines[start - 1:end]))
+
+
+def _split_lines(lines, block, max_tokens):
+    """Cuts an oversized block into consecutive line windows within max_tokens."""
+    pieces = []
+    start, used = block.start, 0
+    for i in range(block.start, block.end + 1):
+        size = estimate_tokens(lines[i - 1])
+        if used and used + size > max_tokens:
+            pieces.append(Block(start, i - 1, block.symbol))
+            start, used = i, 0
+        used += size
+    pieces.append(Block(start, block.end, block.symbol))
+    return pieces
+
+
+def chunk_file(path: str, text: str, max_tokens: int = CHUNK_MAX_TOKENS):
+    """
+    Splits a file into structure-aligned chunks of at most max_tokens.
+    Neighbouring small blocks are packed together; no text is repeated.
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    name = path.rsplit("/", 1)[-1]
+    ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    splitter = CHUNKERS.get(ext, split_paragraphs)
+
+    blocks = []
+    for block in splitter(lines, max_tokens):
+        if block.end < block.start:
+            continue
+        if _tokens(lines, block.start, block.end) > max_tokens:
+            blocks.extend(_split_lines(lines, block, max_tokens))
+        else:
+            blocks.append(block)
+
+    chunks = []
+    current, used = None, 0
+    for block in blocks:
+        size = _tokens(lines, block.start, block.end)
+        if current and used + size <= max_tokens:
+            current = Block(current.start, block.end, current.symbol or block.symbol)
+            used += size
+            continue
+        if current:
+            chunks.append(current)
+        current, used = block, size
+    if current:
+        chunks.append(current)
+
+    result = []
+    for c in chunks:
+        body = "".join(lines[c.start - 1:c.end])
+        if body.strip():
+            result.append(Chunk(body, c.start, c.end, c.symbol))
+    return result
@@ -0,0 +1,83 @@
+import os
+import re
+from rag.chunker import estimate_tokens
+
+# Token budget for retrieved code in a RAG prompt and how many candidates to consider.
+# The old prompt sent 5 chunks of up to 1000 chars (~1,250 tokens); stay at or below that.
+# At up to 256 tokens a chunk the budget holds 4-5 full chunks, a few more once merged.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))
+CONTEXT_CANDIDATES = int(os.getenv("RAG_CONTEXT_CANDIDATES", "6"))
+
+# Header the old fixed-window chunker prepended to every chunk
+_LEGACY_HEADER_RE = re.compile(r"^File: [^\n]*\n\n")
+
+
+class _Segment:
+    """A contiguous line range of one file assembled from one or more chunks."""
+
+    def __init__(self, start: int, lines: dict):
+        self.start = start
+        self.lines = lines              # line number -> text (with newline)
+
+    @property
+    def end(self) -> int:
+        return max(self.lines)
+
+    def touches(self, start: int, end: int) -> bool:
+        return start <= self.end + 1 and end + 1 >= self.start
+
+    def render(self) -> str:
+        return "".join(self.lines[i] for i in sorted(self.lines))
+
+
+def _lines_of(text: str, start_line: int) -> dict:
+    return {start_line + i: line for i, line in enumerate(text.splitlines(keepends=True))}
+
+
+def pack_context(documents, metadatas, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Builds the prompt context from ranked chunks (best first).
+
+    Overlapping or adjacent chunks of the same file are merged so no line is
+    sent twice, legacy "File:" headers are stripped, and chunks are taken in
+    rank order until the token budget is spent. Each file gets one header.
+    """
+    files = {}                          # path -> [_Segment], in rank order of first hit
+    used = 0
+
+    for doc, meta in zip(documents, metadatas):
+        path = meta.get("file_path", "?")
+        text = _LEGACY_HEADER_RE.sub("", doc, count=1)
+        start = meta.get("start_line")
+        if start is None:
+            # Chunks without line info can't be merged, only de-duplicated
+            start = -(meta.get("chunk", 0) + 1) * 1_000_000
+        new_lines = _lines_of(text, start)
+        if not new_lines:
+            continue
+
+        segments = files.setdefault(path, [])
+        touching = [s for s in segments if s.touches(min(new_lines), max(new_lines))]
+        known = {}
+        for s in touching:
+            known.update(s.lines)
+
+        added = {n: l for n, l in new_lines.items() if n not in known}
+        if not added:
+            continue
+        cost = estimate_tokens("".join(added.values()))
+        if used + cost > budget:
+            continue
+        used += cost
+
+        merged = _Segment(min(list(known) + list(new_lines)), {**known, **new_lines})
+        files[path] = [s for s in segments if s not in touching] + [merged]
+
+    parts = []
+    for path, segments in files.items():
+        if not segments:
+            continue
+        body = "\n...\n".join(s.render().rstrip("\n") for s in sorted(segments, key=lambda s: s.start))
+        ranges = ", ".join(f"{s.start}-{s.end}" for s in sorted(segments, key=lambda s: s.start) if s.start > 0)
+        parts.append(f"--- {path}" + (f" (lines {ranges})" if ranges else "") + f" ---\n{body}\n")
+    return "\n".join(parts)
@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from rag.index_store import INDEX_DIR
+from services.embedding_service import get_embedding_service
+from metrics import register_cache
+
+CACHE_DIR = os.getenv("RAG_EMBED_CACHE_DIR", os.path.join(INDEX_DIR, "embedding_cache"))
+CACHE_CAPACITY = int(os.getenv("RAG_EMBED_CACHE_CAPACITY", "200000"))  # number of vectors
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, disk-backed cache of (model name, chunk hash) -> vector.
+
+    Vectors live in a fixed-capacity memory-mapped float32 array; a SQLite
+    index maps each key to its slot and tracks last use so the least recently
+    used entries are evicted once the array is full.
+    """
+
+    def __init__(self, model_name: str, dim: int, base_dir: str = CACHE_DIR, capacity: int = CACHE_CAPACITY):
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.join(base_dir, re.sub(r"[^A-Za-z0-9._-]", "_", model_name))
+        os.makedirs(cache_dir, exist_ok=True)
+        vectors_path = os.path.join(cache_dir, "vectors.f32")
+        index_path = os.path.join(cache_dir, "index.sqlite")
+        meta_path = os.path.join(cache_dir, "meta.json")
+
+        # A different shape means the files are useless to us; start over
+        meta = {"dim": dim, "capacity": capacity}
+        if not self._meta_matches(meta_path, meta):
+            for path in (vectors_path, index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+        mode = "r+" if os.path.exists(vectors_path) else "w+"
+        self.vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(capacity, dim))
+
+        self.db = sqlite3.connect(index_path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries "
+                        "(key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self.db.commit()
+
+        used = {row[0] for row in self.db.execute("SELECT slot FROM entries")}
+        self._free = [s for s in range(capacity - 1, -1, -1) if s not in used]
+
+    @staticmethod
+    def _meta_matches(meta_path: str, meta: dict) -> bool:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f) == meta
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys) -> dict:
+        """Returns {key: vector} for the keys present in the cache."""
+        keys = list(set(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = np.array(self.vectors[slot])
+
+            now = time.time()
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                [(now, k) for k in found])
+            self.db.commit()
+        return found
+
+    def put_many(self, keys, vectors):
+        with self._lock:
+            now = time.time()
+            for key, vector in zip(keys, vectors):
+                existing = self.db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                slot = existing[0] if existing else self._allocate()
+                self.vectors[slot] = vector
+                # Written row by row so a later eviction in this same batch can see it
+                self.db.execute("INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                                (key, slot, now))
+            self.db.commit()
+            self.vectors.flush()
+
+    def _allocate(self) -> int:
+        if not self._free:
+            # Evict the least recently used tenth in one go rather than one slot per insert
+            victims = self.db.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?",
+                                      (max(1, self.capacity // 10),)).fetchall()
+            self.db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            self._free.extend(slot for _, slot in victims)
+            self.evictions += len(victims)
+        return self._free.pop()
+
+    def encode(self, texts, encode_fn) -> np.ndarray:
+        """
+        Embeds texts, calling encode_fn only for texts not already cached.
+        Identical texts within the same call are embedded once.
+        """
+        texts = list(texts)
+        keys = [self.key(t) for t in texts]
+        found = self.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        with self._lock:
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = encode_fn(list(missing.values()))
+            self.put_many(missing.keys(), vectors)
+            found.update(zip(missing.keys(), vectors))
+
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([found[k] for k in keys])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self.capacity - len(self._free),
+            "capacity": self.capacity,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the shared cache for the process-wide embedding model."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            service = get_embedding_service()
+            _cache = EmbeddingCache(service.model_name, service.dimension)
+        return _cache
+
+
+# Reported once the cache exists; scraping metrics must not create it
+register_cache("rag_embeddings", lambda: _cache.stats() if _cache is not None else None)
+
+
+def cached_encode(texts) -> np.ndarray:
+    """Bulk-embeds texts through the shared embedding cache."""
+    service = get_embedding_service()
+    return get_embedding_cache().encode(texts, lambda batch: service.encode(batch, interactive=False))
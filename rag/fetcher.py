@@ -0,0 +1,153 @@
+import os
+import base64
+import tarfile
+import time
+import requests
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Fetch strategy: "archive" (one tarball download), "blobs" (parallel blob API calls)
+# or "auto" (archive for anything but a handful of files)
+FETCH_MODE = os.getenv("RAG_FETCH_MODE", "auto")
+ARCHIVE_MIN_FILES = int(os.getenv("RAG_ARCHIVE_MIN_FILES", "20"))
+BLOB_WORKERS = int(os.getenv("RAG_BLOB_WORKERS", "8"))
+ARCHIVE_TIMEOUT = float(os.getenv("RAG_ARCHIVE_TIMEOUT", "60"))
+BLOB_RETRIES = int(os.getenv("RAG_BLOB_RETRIES", "2"))
+
+TEXT_EXTS = {'py','js','jsx','ts','tsx','java','cpp','c','h','cs','rb','go','rs',
+             'php','html','css','json','xml','yaml','yml','md','txt','sh','sql'}
+TEXT_NAMES = {'Dockerfile','Makefile','README'}
+MAX_FILE_SIZE = 500000
+
+TreeEntry = namedtuple("TreeEntry", ["path", "sha", "size"])
+
+
+class FetchError(RuntimeError):
+    """A file listed in the tree could not be fetched."""
+
+
+def is_indexable(path: str, size: int) -> bool:
+    name = path.rsplit('/', 1)[-1]
+    if size >= MAX_FILE_SIZE:
+        return False
+    ext = name.split('.')[-1].lower() if '.' in name else ''
+    return ext in TEXT_EXTS or name in TEXT_NAMES
+
+
+def _is_file(e) -> bool:
+    # Symlinks are blobs too (mode 120000), but hold a link target, not file content
+    return e.type == "blob" and e.mode != "120000"
+
+
+def list_tree(repo, ref: str) -> dict:
+    """
+    Lists indexable files at ref with a single recursive Git Trees API call.
+    Returns {path: TreeEntry}. Falls back to per-directory tree calls when
+    GitHub truncates the recursive listing (very large repositories).
+    """
+    tree = repo.get_git_tree(ref, recursive=True)
+    if tree.raw_data.get("truncated"):
+        return _walk_tree(repo, ref, "")
+
+    return {
+        e.path: TreeEntry(e.path, e.sha, e.size or 0)
+        for e in tree.tree
+        if _is_file(e) and is_indexable(e.path, e.size or 0)
+    }
+
+
+def _walk_tree(repo, sha: str, prefix: str) -> dict:
+    files = {}
+    for e in repo.get_git_tree(sha).tree:
+        path = f"{prefix}{e.path}"
+        if e.type == "tree":
+            files.update(_walk_tree(repo, e.sha, f"{path}/"))
+        elif _is_file(e) and is_indexable(path, e.size or 0):
+            files[path] = TreeEntry(path, e.sha, e.size or 0)
+    return files
+
+
+def fetch_files(repo, ref: str, entries, mode: str = FETCH_MODE):
+    """
+    Yields (TreeEntry, text) for the requested entries. Binary or non-UTF-8
+    files are skipped. Order is not guaranteed to match entries. Raises
+    FetchError if a file can't be fetched, so the sync fails (and resumes
+    later) instead of recording the file as indexed.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    if mode == "auto":
+        mode = "archive" if len(entries) >= ARCHIVE_MIN_FILES else "blobs"
+
+    if mode == "archive":
+        yield from _fetch_archive(repo, ref, entries)
+    else:
+        yield from _fetch_blobs(repo, entries)
+
+
+def _fetch_archive(repo, ref: str, entries):
+    """
+    Downloads the tarball for ref once and decodes wanted files straight from
+    the stream. Files the archive leaves out (export-ignore) are fetched
+    through the blob API afterwards.
+    """
+    wanted = {e.path: e for e in entries}
+    url = repo.get_archive_link("tarball", ref=ref)
+
+    with requests.get(url, stream=True, timeout=ARCHIVE_TIMEOUT) as r:
+        r.raise_for_status()
+        with tarfile.open(fileobj=r.raw, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile() or '/' not in member.name:
+                    continue
+                # Strip the "<owner>-<repo>-<sha>/" directory GitHub prefixes every path with
+                entry = wanted.pop(member.name.split('/', 1)[1], None)
+                if entry is None:
+                    continue
+                text = _decode(tar.extractfile(member).read())
+                if text is not None:
+                    yield entry, text
+
+    if wanted:
+        print(f"⚠️ {len(wanted)} files missing from the {ref[:7]} archive, fetching them as blobs")
+        yield from _fetch_blobs(repo, wanted.values())
+
+
+def _fetch_blobs(repo, entries):
+    """Fetches blobs concurrently; used when only a few files changed."""
+    def fetch(entry):
+        for attempt in range(BLOB_RETRIES + 1):
+            try:
+                blob = repo.get_git_blob(entry.sha)
+                return entry, _decode(base64.b64decode(blob.content))
+            except Exception as e:
+                if attempt == BLOB_RETRIES:
+                    raise FetchError(f"Failed to fetch {entry.path}: {e}") from e
+                print(f"⚠️ Failed to fetch {entry.path}, retrying: {e}")
+                time.sleep(0.5 * 2 ** attempt)
+
+    # Keep only a small window of blobs in flight so a slow consumer bounds memory
+    with ThreadPoolExecutor(max_workers=BLOB_WORKERS) as pool:
+        in_flight = deque()
+        for entry in entries:
+            in_flight.append(pool.submit(fetch, entry))
+            if len(in_flight) >= BLOB_WORKERS * 2:
+                yield from _ready(in_flight.popleft())
+        while in_flight:
+            yield from _ready(in_flight.popleft())
+
+
+def _ready(future):
+    entry, text = future.result()
+    if text is not None:
+        yield entry, text
+
+
+def _decode(data: bytes):
+    if b"\0" in data[:8000]:
+        return None
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import threading
+from rag.vector_store import open_store, select_backend
+from metrics import registry
+
+# Root directory for persisted RAG indexes (vector stores + per-repo manifests)
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", ".rag_index")
+
+_repo_locks = {}
+_repo_locks_guard = threading.Lock()
+
+
+def repo_lock(repo_name: str) -> threading.Lock:
+    """One lock per repository so concurrent (re)indexing of the same repo is serialised."""
+    key = repo_name.lower()
+    with _repo_locks_guard:
+        if key not in _repo_locks:
+            _repo_locks[key] = threading.Lock()
+        return _repo_locks[key]
+
+
+class RepoIndex:
+    """
+    Persistent vector index for a single repository.
+
+    Each repository gets its own vector store (a quantized NumPy matrix for
+    small and medium repos, a Chroma collection for large ones) plus a small
+    JSON manifest recording which commit it was built from, so the index is
+    addressed as owner/repo@<commit sha> and survives process restarts.
+    """
+
+    def __init__(self, repo_name: str, base_dir: str = INDEX_DIR):
+        self.repo_name = repo_name
+        self.base_dir = base_dir
+        self.key = hashlib.sha1(repo_name.lower().encode("utf-8")).hexdigest()[:24]
+        self.manifest_path = os.path.join(base_dir, "manifests", f"{self.key}.json")
+
+        self.manifest = self._load_manifest()
+        # Manifests written before backends existed always used Chroma
+        self.store = open_store(self.manifest.get("backend", "chroma"), base_dir, self.key)
+
+    # -------------------- Manifest --------------------
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self._empty_manifest(select_backend(0))
+
+    def _empty_manifest(self, backend: str) -> dict:
+        # blobs maps file path -> git blob SHA of the version currently embedded
+        return {"repo": self.repo_name, "commit_sha": None, "files": 0, "chunks": 0,
+                "blobs": {}, "backend": backend}
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def commit_sha(self):
+        return self.manifest.get("commit_sha")
+
+    @property
+    def backend(self) -> str:
+        return self.store.backend
+
+    @property
+    def namespace(self) -> str:
+        return f"{self.repo_name}@{self.commit_sha}"
+
+    def is_current(self, commit_sha: str) -> bool:
+        """
+        True for a complete index of commit_sha. A repo without indexable files
+        is current with zero chunks; a store that lost chunks the manifest
+        recorded is not.
+        """
+        return self.commit_sha == commit_sha and self.count() == self.manifest.get("chunks", 0)
+
+    @property
+    def blobs(self) -> dict:
+        return self.manifest.get("blobs", {})
+
+    def diff(self, blobs: dict):
+        """
+        Compares a tree listing (path -> blob SHA) with what is embedded.
+        Returns (added, changed, removed) path lists.
+        """
+        indexed = self.blobs
+        added = [p for p in blobs if p not in indexed]
+        changed = [p for p in blobs if p in indexed and indexed[p] != blobs[p]]
+        removed = [p for p in indexed if p not in blobs]
+        return added, changed, removed
+
+    def ensure_layout(self, layout: str):
+        """
+        Resets the index if it was built with a different chunk layout
+        (e.g. another chunker version), since its chunks are not reusable.
+        """
+        if self.manifest.get("layout") != layout:
+            if self.blobs or self.count():
+                print(f"Index layout changed for {self.repo_name}, rebuilding")
+                self.reset()
+            self.manifest["layout"] = layout
+
+    def choose_backend(self, estimated_chunks: int):
+        """
+        Switches to the backend suited to the repo's size. Switching drops the
+        old store; re-embedding is mostly served by the embedding cache. An
+        index with content keeps its backend within the hysteresis band.
+        """
+        current = self.backend if self.blobs or self.count() else None
+        backend = select_backend(estimated_chunks, current)
+        if backend != self.backend:
+            print(f"Using {backend} vector store for {self.repo_name} (~{estimated_chunks} chunks)")
+            layout = self.manifest.get("layout")
+            self.store.drop()
+            self.store = open_store(backend, self.base_dir, self.key)
+            self.manifest = self._empty_manifest(backend)
+            self.manifest["layout"] = layout
+            self._save_manifest()
+
+    def commit(self, commit_sha: str, blobs: dict):
+        """Publishes pending writes and marks the store as an index of repo@commit_sha."""
+        self.store.flush()
+        self.manifest.update({"repo": self.repo_name, "commit_sha": commit_sha,
+                              "files": len(blobs), "chunks": self.count(), "blobs": blobs})
+        self._save_manifest()
+
+    # -------------------- Vector store --------------------
+    def reset(self):
+        """Drops every chunk of this repository (other repositories are untouched)."""
+        self.store.drop()
+        self.manifest = self._empty_manifest(self.backend)
+        self._save_manifest()
+
+    def count(self) -> int:
+        return self.store.count()
+
+    def upsert(self, documents, embeddings, metadatas, ids):
+        self.store.upsert(documents=documents, embeddings=embeddings, metadatas=metadatas, ids=ids)
+
+    def delete_files(self, paths):
+        """Removes every chunk belonging to the given file paths."""
+        self.store.delete_files(paths)
+
+    def query(self, embedding, n: int):
+        return self.store.query(embedding, n)
+
+
+def index_sizes(base_dir: str = INDEX_DIR) -> dict:
+    """{repo: (files, chunks)} for every persisted index, read from the manifests."""
+    sizes = {}
+    manifests = os.path.join(base_dir, "manifests")
+    if not os.path.isdir(manifests):
+        return sizes
+    for name in os.listdir(manifests):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(manifests, name), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        sizes[manifest.get("repo", name)] = (manifest.get("files", 0), manifest.get("chunks", 0))
+    return sizes
+
+
+registry.callback("rag_index_chunks", "Chunks stored in each repository index.",
+                  lambda: {(repo,): chunks for repo, (_, chunks) in index_sizes().items()}, ("repo",))
+registry.callback("rag_index_files", "Files indexed for each repository.",
+                  lambda: {(repo,): files for repo, (files, _) in index_sizes().items()}, ("repo",))
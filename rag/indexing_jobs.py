@@ -0,0 +1,138 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from metrics import registry
+
+INDEX_WORKERS = int(os.getenv("RAG_INDEX_WORKERS", "2"))
+INDEX_MAX_PENDING = int(os.getenv("RAG_INDEX_MAX_PENDING", "16"))
+INDEX_JOB_HISTORY = int(os.getenv("RAG_INDEX_JOB_HISTORY", "200"))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class IndexJob:
+    def __init__(self, repo_name: str, commit_sha: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.repo_name = repo_name
+        self.commit_sha = commit_sha
+        self.status = "queued"          # queued -> running -> done | failed
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def key(self) -> str:
+        return f"{self.repo_name.lower()}@{self.commit_sha}"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "repo": self.repo_name,
+            "commit": self.commit_sha,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IndexJobManager:
+    """
+    Runs repository indexing in a bounded background worker pool.
+    Submitting the same repo@commit while a job for it is queued or running
+    returns the existing job instead of indexing twice.
+    """
+
+    def __init__(self, workers: int = INDEX_WORKERS, max_pending: int = INDEX_MAX_PENDING,
+                 history: int = INDEX_JOB_HISTORY):
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-index")
+        self._jobs = OrderedDict()      # job id -> IndexJob
+        self._active = {}               # repo@sha -> IndexJob
+        self._lock = threading.Lock()
+
+    def submit(self, repo_name: str, commit_sha: str, index_fn) -> IndexJob:
+        """
+        Queues index_fn(on_progress) for repo@commit_sha unless one is already
+        in flight. Raises JobQueueFull when too many jobs are waiting.
+        """
+        with self._lock:
+            key = f"{repo_name.lower()}@{commit_sha}"
+            if key in self._active:
+                return self._active[key]
+
+            pending = sum(1 for j in self._active.values() if j.status == "queued")
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Too many indexing jobs queued ({pending})")
+
+            job = IndexJob(repo_name, commit_sha)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._trim()
+
+        self._executor.submit(self._run, job, index_fn)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_job(self, repo_name: str, commit_sha: str):
+        with self._lock:
+            return self._active.get(f"{repo_name.lower()}@{commit_sha}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {s: statuses.count(s) for s in ("queued", "running", "done", "failed")}
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history limit
+        excess = len(self._jobs) - self.history
+        for job_id in [jid for jid, j in self._jobs.items() if j.finished][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IndexJob, index_fn):
+        job.status = "running"
+        job.started_at = time.time()
+
+        def on_progress(stats):
+            job.progress = stats
+
+        try:
+            job.result = index_fn(on_progress)
+            job.status = "done"
+        except Exception as e:
+            print(f"❌ Indexing {job.key} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+            job._done.set()
+
+
+index_jobs = IndexJobManager()
+registry.callback("rag_index_jobs", "Indexing jobs by status (finished jobs within the retained history).",
+                  lambda: {(status,): n for status, n in index_jobs.stats().items()}, ("status",))
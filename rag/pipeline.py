@@ -0,0 +1,166 @@
+import os
+import time
+import queue
+import threading
+
+# Bounds on work in flight between stages; together they cap peak memory
+PIPELINE_FILE_QUEUE = int(os.getenv("RAG_PIPELINE_FILE_QUEUE", "32"))      # fetched files awaiting chunking
+PIPELINE_BATCH_QUEUE = int(os.getenv("RAG_PIPELINE_BATCH_QUEUE", "4"))     # chunk batches between stages
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "128"))           # chunks per embedding call
+UPSERT_BATCH_SIZE = int(os.getenv("RAG_UPSERT_BATCH_SIZE", "512"))         # chunks per vector store write
+
+_DONE = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class IndexPipeline:
+    """
+    Streaming fetch -> chunk -> embed -> upsert pipeline.
+
+    Fetching, chunking and embedding each run in their own thread and hand
+    work downstream through bounded queues, so network and CPU work overlap
+    and no stage ever holds more than its queue allows. Upserts run on the
+    calling thread. A file counts as completed once its last chunk has been
+    written, which lets callers record partial progress if a run fails.
+    """
+
+    def __init__(self, files, chunk_fn, embed_fn, upsert_fn, total_files: int = None,
+                 embed_batch_size: int = EMBED_BATCH_SIZE, upsert_batch_size: int = UPSERT_BATCH_SIZE,
+                 file_queue_size: int = PIPELINE_FILE_QUEUE, batch_queue_size: int = PIPELINE_BATCH_QUEUE,
+                 on_progress=None):
+        self.files = files                  # iterable of (entry, text)
+        self.chunk_fn = chunk_fn            # (path, text) -> [(id, document, metadata)]
+        self.embed_fn = embed_fn            # [document] -> [[float]]
+        self.upsert_fn = upsert_fn          # (documents, embeddings, metadatas, ids) -> None
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.on_progress = on_progress
+
+        self._files_q = queue.Queue(maxsize=file_queue_size)
+        self._chunks_q = queue.Queue(maxsize=batch_queue_size)
+        self._embedded_q = queue.Queue(maxsize=batch_queue_size)
+        self._stop = threading.Event()
+        self._errors = []
+
+        self.completed = []                 # paths whose chunks are all written
+        self.stats = {"files_total": total_files, "files_fetched": 0, "files": 0,
+                      "chunks_embedded": 0, "chunks": 0, "seconds": 0.0}
+
+    # -------------------- Queue helpers --------------------
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise PipelineStopped()
+
+    def _stage(self, target, out_q):
+        def run():
+            try:
+                target()
+            except PipelineStopped:
+                return
+            except Exception as e:
+                self._errors.append(e)
+                self._stop.set()
+                return
+            self._put(out_q, _DONE)
+        return threading.Thread(target=run, daemon=True)
+
+    # -------------------- Stages --------------------
+    def _fetch(self):
+        for entry, text in self.files:
+            self._put(self._files_q, (entry.path, text))
+            self.stats["files_fetched"] += 1
+
+    def _chunk(self):
+        batch, finished = [], []
+        while True:
+            item = self._get(self._files_q)
+            if item is _DONE:
+                break
+            path, text = item
+            records = self.chunk_fn(path, text)
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.embed_batch_size:
+                    self._put(self._chunks_q, (batch, finished))
+                    batch, finished = [], []
+            # The file is finished in whichever batch carries its last chunk
+            finished.append(path)
+        if batch or finished:
+            self._put(self._chunks_q, (batch, finished))
+
+    def _embed(self):
+        while True:
+            item = self._get(self._chunks_q)
+            if item is _DONE:
+                break
+            batch, finished = item
+            vectors = self.embed_fn([doc for _, doc, _ in batch]) if batch else []
+            self.stats["chunks_embedded"] += len(batch)
+            self._put(self._embedded_q, (batch, vectors, finished))
+
+    def _write(self, pending, vectors, finished):
+        if pending:
+            self.upsert_fn(documents=[doc for _, doc, _ in pending],
+                           embeddings=[list(map(float, v)) for v in vectors],
+                           metadatas=[meta for _, _, meta in pending],
+                           ids=[cid for cid, _, _ in pending])
+        self.completed.extend(finished)
+        self.stats["files"] += len(finished)
+        self.stats["chunks"] += len(pending)
+        if self.on_progress:
+            self.on_progress(dict(self.stats))
+
+    def run(self) -> dict:
+        """Runs the pipeline to completion. Re-raises the first stage error."""
+        start = time.perf_counter()
+        threads = [
+            self._stage(self._fetch, self._files_q),
+            self._stage(self._chunk, self._chunks_q),
+            self._stage(self._embed, self._embedded_q),
+        ]
+        for t in threads:
+            t.start()
+
+        pending, vectors, finished = [], [], []
+        try:
+            while True:
+                item = self._get(self._embedded_q)
+                if item is _DONE:
+                    break
+                batch, batch_vectors, batch_finished = item
+                pending.extend(batch)
+                vectors.extend(batch_vectors)
+                finished.extend(batch_finished)
+                if len(pending) >= self.upsert_batch_size:
+                    self._write(pending, vectors, finished)
+                    pending, vectors, finished = [], [], []
+            self._write(pending, vectors, finished)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join(timeout=5)
+            self.stats["seconds"] = time.perf_counter() - start
+
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
@@ -0,0 +1,374 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+# Repos estimated at or below this many chunks use the NumPy store, larger ones Chroma
+NUMPY_MAX_CHUNKS = int(os.getenv("RAG_NUMPY_MAX_CHUNKS", "50000"))
+# An existing index only switches backend once the estimate is this far past the threshold
+BACKEND_HYSTERESIS = float(os.getenv("RAG_BACKEND_HYSTERESIS", "0.2"))
+# Quantization of stored vectors in the NumPy store: int8 or float16
+NUMPY_DTYPE = os.getenv("RAG_NUMPY_DTYPE", "int8")
+# Rows scored per matrix-vector product; bounds the temporary float32 copy
+NUMPY_SCAN_BLOCK = 8192
+# Attempts at opening the published version while concurrent flushes keep replacing it
+NUMPY_OPEN_RETRIES = 3
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_dir: str):
+    """
+    Returns the process-wide persistent Chroma client for base_dir.
+    Chroma does not like several clients on the same path, so we share one.
+    """
+    base_dir = os.path.abspath(base_dir)
+    with _clients_lock:
+        if base_dir not in _clients:
+            os.makedirs(base_dir, exist_ok=True)
+            _clients[base_dir] = chromadb.PersistentClient(
+                path=base_dir,
+                settings=Settings(anonymized_telemetry=False, allow_reset=True)
+            )
+        return _clients[base_dir]
+
+
+def select_backend(estimated_chunks: int, current: str = None) -> str:
+    """
+    Backend for a repo of about estimated_chunks chunks. Given the backend an
+    index already uses, it is kept unless the estimate clears the threshold by
+    BACKEND_HYSTERESIS, so a repo hovering near it isn't rebuilt on every sync.
+    """
+    if current == "numpy":
+        return "numpy" if estimated_chunks <= NUMPY_MAX_CHUNKS * (1 + BACKEND_HYSTERESIS) else "chroma"
+    if current == "chroma":
+        return "chroma" if estimated_chunks > NUMPY_MAX_CHUNKS * (1 - BACKEND_HYSTERESIS) else "numpy"
+    return "numpy" if estimated_chunks <= NUMPY_MAX_CHUNKS else "chroma"
+
+
+def open_store(backend: str, base_dir: str, key: str):
+    if backend == "numpy":
+        return NumpyStore(os.path.join(base_dir, "numpy", key))
+    return ChromaStore(base_dir, f"repo_{key}")
+
+
+class ChromaStore:
+    """HNSW-backed store for large repositories."""
+
+    backend = "chroma"
+
+    def __init__(self, base_dir: str, collection_name: str):
+        self.client = get_client(base_dir)
+        self.collection_name = collection_name
+        self.collection = self.client.get_or_create_collection(collection_name, metadata={"hnsw:space": "cosine"})
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(self, documents, embeddings, metadatas, ids):
+        self.collection.upsert(documents=documents, embeddings=embeddings, metadatas=metadatas, ids=ids)
+
+    def delete_files(self, paths, batch_size: int = 500):
+        paths = list(paths)
+        for i in range(0, len(paths), batch_size):
+            self.collection.delete(where={"file_path": {"$in": paths[i:i + batch_size]}})
+
+    def query(self, embedding, n: int):
+        return self.collection.query(query_embeddings=[embedding], n_results=min(n, self.count()))
+
+    def flush(self):
+        pass
+
+    def drop(self):
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+        self.collection = self.client.create_collection(self.collection_name, metadata={"hnsw:space": "cosine"})
+
+
+class NumpyStore:
+    """
+    Compact brute-force store for small and medium repositories.
+
+    Normalised vectors are quantized (int8 with a per-row scale, or float16)
+    into one matrix that is memory-mapped on open, so loading is instant and
+    a query is a blocked matrix-vector product plus a top-k partition.
+    Documents and metadata sit in a records file addressed by byte offsets,
+    so only the top-k records are ever decoded. Chunk ids and a per-row file
+    index sit alongside, so deletes and replacements never decode records.
+
+    Writes go to a new version directory: upserts are appended to staging
+    files and deletes are tombstones (a mask over the current rows). flush()
+    copies the surviving rows block by block into the new version and
+    publishes it; readers keep using the previous version until then. Memory
+    stays bounded by the block size and the size of the change, not the repo.
+    """
+
+    backend = "numpy"
+
+    def __init__(self, path: str, dtype: str = NUMPY_DTYPE):
+        self.path = path
+        self.dtype = dtype
+        self._staged = None
+        self._open()
+
+    @property
+    def _np_dtype(self):
+        return np.float16 if self.dtype == "float16" else np.int8
+
+    # -------------------- Read side --------------------
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.path, "CURRENT"), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _open(self):
+        # A flush in another process can publish a newer version and prune the one
+        # CURRENT named a moment ago; re-read CURRENT and load that instead
+        for _ in range(NUMPY_OPEN_RETRIES):
+            version = self._current_version()
+            try:
+                return self._load(version)
+            except FileNotFoundError:
+                if self._current_version() == version:
+                    raise
+        self._load(self._current_version())
+
+    def _load(self, version):
+        if version is None:
+            self.vectors = np.zeros((0, 0), dtype=self._np_dtype)
+            self.scales = np.zeros(0, dtype=np.float32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.records = b""
+            self.ids = np.zeros(0, dtype="S1")
+            self.path_ids = np.zeros(0, dtype=np.int32)
+            self.paths = []
+            return
+
+        d = os.path.join(self.path, version)
+        self.vectors = np.load(os.path.join(d, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(d, "scales.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(d, "offsets.npy"), mmap_mode="r")
+        records_path = os.path.join(d, "records.bin")
+        self.records = np.memmap(records_path, dtype=np.uint8, mode="r") if os.path.getsize(records_path) else b""
+        try:
+            self.ids = np.load(os.path.join(d, "ids.npy"), mmap_mode="r")
+            self.path_ids = np.load(os.path.join(d, "path_ids.npy"), mmap_mode="r")
+            with open(os.path.join(d, "paths.json"), "r", encoding="utf-8") as f:
+                self.paths = json.load(f)
+        except FileNotFoundError:
+            self._index_rows()
+
+    def _index_rows(self):
+        # Versions written before the row index existed: derive it once, a record at a time
+        ids, path_ids, paths, positions = [], [], [], {}
+        for row in range(len(self.scales)):
+            record = self._record(row)
+            path = record["metadata"].get("file_path", "")
+            if path not in positions:
+                positions[path] = len(paths)
+                paths.append(path)
+            ids.append(record["id"].encode("utf-8"))
+            path_ids.append(positions[path])
+        self.ids = np.array(ids, dtype="S") if ids else np.zeros(0, dtype="S1")
+        self.path_ids = np.array(path_ids, dtype=np.int32)
+        self.paths = paths
+
+    def _raw_record(self, row: int) -> bytes:
+        return bytes(self.records[self.offsets[row]:self.offsets[row + 1]])
+
+    def _record(self, row: int) -> dict:
+        return json.loads(self._raw_record(row).decode("utf-8"))
+
+    def count(self) -> int:
+        """Chunks in the published version (what query() searches)."""
+        return len(self.scales)
+
+    def query(self, embedding, n: int):
+        """Returns results in the same shape as a Chroma collection query."""
+        total = len(self.scales)
+        n = min(n, total)
+        if n <= 0:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+        q = np.asarray(embedding, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, NUMPY_SCAN_BLOCK):
+            block = self.vectors[start:start + NUMPY_SCAN_BLOCK]
+            scores[start:start + len(block)] = (block.astype(np.float32) @ q) / self.scales[start:start + len(block)]
+
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        records = [self._record(int(row)) for row in top]
+        return {
+            "ids": [[r["id"] for r in records]],
+            "documents": [[r["document"] for r in records]],
+            "metadatas": [[r["metadata"] for r in records]],
+            "distances": [[float(1.0 - scores[row]) for row in top]],
+        }
+
+    # -------------------- Write side --------------------
+    def _writable(self) -> dict:
+        """Starts a new version directory with empty staging files and no tombstones."""
+        if self._staged is None:
+            version = uuid.uuid4().hex[:12]
+            d = os.path.join(self.path, version)
+            os.makedirs(d)
+            self._staged = {
+                "version": version,
+                "dir": d,
+                "deleted": np.zeros(len(self.scales), dtype=bool),   # tombstones over current rows
+                "vectors": open(os.path.join(d, "vectors.staged"), "wb"),
+                "records": open(os.path.join(d, "records.staged"), "wb"),
+                "dim": self.vectors.shape[1] if len(self.scales) else None,
+                "scales": [],
+                "offsets": [0],
+                "paths": [],
+                "rows": {},        # chunk id -> staged row, for replacement
+                "dead": set(),     # staged rows replaced or deleted since
+            }
+        return self._staged
+
+    def _quantize(self, vector):
+        v = np.asarray(vector, dtype=np.float32)
+        v = v / (np.linalg.norm(v) or 1.0)
+        if self.dtype == "float16":
+            return v.astype(np.float16), 1.0
+        scale = 127.0 / (float(np.abs(v).max()) or 1.0)
+        return np.round(v * scale).astype(np.int8), scale
+
+    def upsert(self, documents, embeddings, metadatas, ids):
+        staged = self._writable()
+        ids = list(ids)
+        if len(self.ids):
+            staged["deleted"] |= np.isin(self.ids, [cid.encode("utf-8") for cid in ids])
+        for doc, emb, meta, cid in zip(documents, embeddings, metadatas, ids):
+            vector, scale = self._quantize(emb)
+            if staged["dim"] is None:
+                staged["dim"] = len(vector)
+            if cid in staged["rows"]:
+                staged["dead"].add(staged["rows"][cid])
+            staged["rows"][cid] = len(staged["scales"])
+            staged["vectors"].write(vector.astype(self._np_dtype).tobytes())
+            data = json.dumps({"id": cid, "document": doc, "metadata": meta}).encode("utf-8")
+            staged["records"].write(data)
+            staged["offsets"].append(staged["offsets"][-1] + len(data))
+            staged["scales"].append(scale)
+            staged["paths"].append(meta.get("file_path", ""))
+
+    def delete_files(self, paths):
+        paths = set(paths)
+        if not paths:
+            return
+        staged = self._writable()
+        gone = [i for i, p in enumerate(self.paths) if p in paths]
+        if gone:
+            staged["deleted"] |= np.isin(self.path_ids, gone)
+        staged["dead"].update(row for row, p in enumerate(staged["paths"]) if p in paths)
+
+    def flush(self):
+        """Publishes the current rows minus tombstones, plus staged rows, as a new version."""
+        staged, self._staged = self._staged, None
+        if staged is None:
+            return
+        staged["vectors"].close()
+        staged["records"].close()
+        d, dtype = staged["dir"], self._np_dtype
+        dim = staged["dim"] or 0
+
+        keep = np.flatnonzero(~staged["deleted"])
+        appended = np.array([r for r in range(len(staged["scales"])) if r not in staged["dead"]], dtype=np.int64)
+        new_vectors = (np.memmap(os.path.join(d, "vectors.staged"), dtype=dtype, mode="r",
+                                 shape=(len(staged["scales"]), dim))
+                       if len(staged["scales"]) and dim else np.zeros((0, dim), dtype=dtype))
+        new_records_path = os.path.join(d, "records.staged")
+        new_records = (np.memmap(new_records_path, dtype=np.uint8, mode="r")
+                       if os.path.getsize(new_records_path) else b"")
+        new_offsets = staged["offsets"]
+
+        # Vectors: surviving rows copied block by block, then the appended ones
+        total = len(keep) + len(appended)
+        vectors = np.lib.format.open_memmap(os.path.join(d, "vectors.npy"), mode="w+", dtype=dtype, shape=(total, dim))
+        row = 0
+        for source, rows in ((self.vectors, keep), (new_vectors, appended)):
+            for start in range(0, len(rows), NUMPY_SCAN_BLOCK):
+                block = rows[start:start + NUMPY_SCAN_BLOCK]
+                vectors[row:row + len(block)] = source[block]
+                row += len(block)
+        vectors.flush()
+        del vectors, new_vectors
+
+        scales = np.concatenate([np.asarray(self.scales[keep], dtype=np.float32),
+                                 np.asarray(staged["scales"], dtype=np.float32)[appended]])
+        np.save(os.path.join(d, "scales.npy"), scales)
+
+        offsets = [0]
+        with open(os.path.join(d, "records.bin"), "wb") as f:
+            for r in keep:
+                data = self._raw_record(r)
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+            for r in appended:
+                data = bytes(new_records[new_offsets[r]:new_offsets[r + 1]])
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(os.path.join(d, "offsets.npy"), np.array(offsets, dtype=np.int64))
+        del new_records
+
+        ids_by_row = [None] * len(staged["scales"])
+        for cid, r in staged["rows"].items():
+            ids_by_row[r] = cid.encode("utf-8")
+        new_ids = [ids_by_row[r] for r in appended]
+        ids = np.concatenate([np.asarray(self.ids[keep]), np.array(new_ids, dtype="S")]) if new_ids \
+            else np.asarray(self.ids[keep])
+        np.save(os.path.join(d, "ids.npy"), ids)
+
+        # Row -> file index, compacted to the paths still present
+        paths = list(self.paths)
+        positions = {p: i for i, p in enumerate(paths)}
+        for p in (staged["paths"][r] for r in appended):
+            if p not in positions:
+                positions[p] = len(paths)
+                paths.append(p)
+        path_ids = np.concatenate([np.asarray(self.path_ids[keep], dtype=np.int64),
+                                   np.array([positions[staged["paths"][r]] for r in appended], dtype=np.int64)])
+        used, inverse = np.unique(path_ids, return_inverse=True)
+        np.save(os.path.join(d, "path_ids.npy"), inverse.astype(np.int32))
+        with open(os.path.join(d, "paths.json"), "w", encoding="utf-8") as f:
+            json.dump([paths[i] for i in used], f)
+
+        os.remove(os.path.join(d, "vectors.staged"))
+        os.remove(new_records_path)
+
+        previous = self._current_version()
+        tmp = os.path.join(self.path, "CURRENT.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(staged["version"])
+        os.replace(tmp, os.path.join(self.path, "CURRENT"))
+
+        # The version just replaced is kept until the next flush, so a reader that read
+        # CURRENT before the swap can still open it; older versions (and staging left by
+        # aborted runs) go, staying readable for anyone who already mapped them
+        for name in os.listdir(self.path):
+            if name not in (staged["version"], previous, "CURRENT") and os.path.isdir(os.path.join(self.path, name)):
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+        self._open()
+
+    def drop(self):
+        if self._staged is not None:
+            self._staged["vectors"].close()
+            self._staged["records"].close()
+            self._staged = None
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._open()
@@ -0,0 +1,200 @@
+import os
+import json
+import threading
+import numpy as np
+
+from router_logic.rules_router import detect_users, extract_repo
+from services.embedding_service import get_embedding_service
+
+EXEMPLARS_PATH = os.getenv(
+    "ROUTER_EXEMPLARS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_exemplars.jsonl"),
+)
+# Neighbours that vote, and the softmax temperature turning their similarities into probabilities
+INTENT_K = int(os.getenv("ROUTER_KNN_K", "5"))
+INTENT_TEMPERATURE = float(os.getenv("ROUTER_KNN_TEMPERATURE", "0.05"))
+# Queries whose nearest exemplar is less similar than this are out of distribution
+INTENT_MIN_SIMILARITY = float(os.getenv("ROUTER_KNN_MIN_SIMILARITY", "0.45"))
+
+AGENTS = ("github", "github_rag", "linear", "none")
+
+
+def load_exemplars(path: str = EXEMPLARS_PATH):
+    """Reads labelled exemplars, one {"text": ..., "agent": ...} JSON object per line."""
+    exemplars = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("agent") not in AGENTS or not row.get("text"):
+                print(f"⚠️ Skipping invalid exemplar on line {n} of {path}")
+                continue
+            exemplars.append((row["text"], row["agent"]))
+    return exemplars
+
+
+def _platt_loss(a: float, b: float, scores, targets) -> float:
+    # Cross-entropy of sigmoid(a * score + b) against the targets, overflow-free
+    z = a * scores + b
+    return float(np.sum(np.logaddexp(0, z) - targets * z))
+
+
+def fit_platt(scores, correct, iterations: int = 100):
+    """
+    Fits P(correct | score) = sigmoid(a * score + b) with Platt's smoothed
+    targets and Newton steps under a backtracking line search (Lin, Lin and
+    Weng's formulation), so near-separable samples converge instead of
+    diverging. Returns (a, b), or None when the sample can't support a fit:
+    no errors or no successes to contrast, or a slope that isn't positive
+    (confidence must rise with the vote share).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    correct = np.asarray(correct, dtype=bool)
+    positives, negatives = int(correct.sum()), int((~correct).sum())
+    if not positives or not negatives:
+        return None
+    targets = np.where(correct, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+
+    a, b = 0.0, float(np.log((positives + 1) / (negatives + 1)))
+    loss = _platt_loss(a, b, scores, targets)
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(a * scores + b)))
+        w = p * (1 - p)
+        grad = np.array([np.sum((p - targets) * scores), np.sum(p - targets)])
+        if np.abs(grad).max() < 1e-6:
+            break
+        hess = np.array([[np.sum(w * scores * scores), np.sum(w * scores)],
+                         [np.sum(w * scores), np.sum(w)]]) + 1e-12 * np.eye(2)
+        step = np.linalg.solve(hess, grad)
+        # Halve the step until the loss drops enough (Armijo condition)
+        rate = 1.0
+        while rate >= 1e-10:
+            na, nb = a - rate * step[0], b - rate * step[1]
+            new_loss = _platt_loss(na, nb, scores, targets)
+            if new_loss < loss - 1e-4 * rate * float(grad @ step):
+                break
+            rate /= 2
+        else:
+            break
+        a, b, loss = na, nb, new_loss
+
+    if not (np.isfinite(a) and np.isfinite(b)) or a <= 0:
+        return None
+    return float(a), float(b)
+
+
+class IntentClassifier:
+    """
+    k-nearest-neighbour intent classifier over labelled exemplar queries.
+
+    Exemplars are embedded once (at startup via warm(), or on first use) with
+    the shared embedding service. A query's k nearest exemplars vote with
+    softmax weights of their cosine similarity, and the winning label's vote
+    share is mapped to a probability of being right by Platt scaling, fitted
+    on leave-one-out predictions over the exemplars themselves. When the
+    exemplars can't support a fit the raw vote share is used instead. Queries
+    far from every exemplar get zero confidence so they escalate to the LLM.
+    """
+
+    def __init__(self, path: str = EXEMPLARS_PATH, k: int = INTENT_K,
+                 temperature: float = INTENT_TEMPERATURE, min_similarity: float = INTENT_MIN_SIMILARITY):
+        self.path = path
+        self.k = k
+        self.temperature = temperature
+        self.min_similarity = min_similarity
+        self._labels = None
+        self._matrix = None
+        self._platt = None   # (a, b), or None to use the raw vote share
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._matrix is None:
+                exemplars = load_exemplars(self.path)
+                texts = [t for t, _ in exemplars]
+                # Interactive priority: a query may be waiting on this, so don't queue behind bulk indexing
+                matrix = get_embedding_service().encode(texts)
+                labels = np.array([a for _, a in exemplars])
+                self._platt = self._calibrate(matrix, labels)
+                self._matrix, self._labels = matrix, labels
+            return self._matrix, self._labels
+
+    def warm(self):
+        """Embeds the exemplars ahead of the first query; failures are left for first use."""
+        try:
+            self._ensure_loaded()
+        except Exception as e:
+            print("⚠️ Could not warm the intent classifier:", e)
+
+    def reload(self):
+        """Drops the embedded exemplars so the file is re-read on the next query."""
+        with self._lock:
+            self._matrix = None
+            self._labels = None
+
+    def _vote(self, sims, labels):
+        """Returns (agent, vote share) from one row of similarities, or None when out of distribution."""
+        k = min(self.k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        if sims[top].max() < self.min_similarity:
+            return None
+        weights = np.exp((sims[top] - sims[top].max()) / self.temperature)
+        scores = {agent: float(weights[labels[top] == agent].sum()) for agent in AGENTS}
+        agent = max(scores, key=scores.get)
+        return agent, scores[agent] / float(weights.sum())
+
+    def _calibrate(self, matrix, labels):
+        """Platt parameters from leave-one-out votes: each exemplar classified by all the others."""
+        if len(labels) < 2:
+            return None
+        sims = matrix @ matrix.T
+        np.fill_diagonal(sims, -np.inf)
+        shares, correct = [], []
+        for i in range(len(labels)):
+            vote = self._vote(sims[i], labels)
+            if vote is not None:
+                shares.append(vote[1])
+                correct.append(vote[0] == labels[i])
+        platt = fit_platt(shares, correct) if shares else None
+        if platt is None:
+            print("⚠️ Intent exemplars can't be calibrated, using raw k-NN vote shares")
+        return platt
+
+    def predict(self, query: str):
+        """Returns (agent, probability that agent is right) for the query."""
+        matrix, labels = self._ensure_loaded()
+        if not len(labels):
+            return "none", 0.0
+
+        q = get_embedding_service().encode([query])[0]
+        vote = self._vote(matrix @ q, labels)
+        if vote is None:
+            return "none", 0.0
+        agent, share = vote
+        if self._platt is None:
+            return agent, share
+        a, b = self._platt
+        return agent, float(1 / (1 + np.exp(-(a * share + b))))
+
+    def classify(self, query: str):
+        """
+        Returns ({"agent", "user", "repo"}, confidence). User and repo come from
+        the same extractors as the rules router; a github_rag intent without a
+        repository is never confident.
+        """
+        agent, confidence = self.predict(query)
+        users = detect_users(query)
+        repo = extract_repo(query)
+
+        if agent == "github_rag" and not repo:
+            confidence = 0.0
+        if len(users) > 1:
+            confidence = min(confidence, 0.5)
+
+        user = users[0] if len(users) == 1 else "unknown"
+        return {"agent": agent, "user": user, "repo": repo if agent == "github_rag" else None}, confidence
+
+
+intent_classifier = IntentClassifier()
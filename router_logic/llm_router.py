@@ -1,22 +1,197 @@
 import os
+import re
 import json
-import google.generativeai as genai
+import time
+import threading
+from collections import OrderedDict
 
-# -------------------- Configure Gemini --------------------
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from llm_client import get_model, CircuitOpenError
+from tracing import span, traced
+from metrics import registry, register_cache
+from router_logic.rules_router import classify, detect_intent, split_clauses
+from router_logic.intent_classifier import intent_classifier
+
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", "gemini-2.5-flash")
+# Routing is interactive: give up on Gemini quickly and route locally instead
+ROUTER_LLM_TIMEOUT_S = float(os.getenv("ROUTER_LLM_TIMEOUT_S", "8"))
+# Routing prompts are short, so a hedge past the p95 latency costs little and trims the tail
+ROUTER_LLM_HEDGE = os.getenv("ROUTER_LLM_HEDGE", "1") == "1"
+
+# Rule-based decisions at or above this confidence skip the Gemini call
+FAST_PATH_THRESHOLD = float(os.getenv("ROUTER_FAST_PATH_THRESHOLD", "0.9"))
+# Embedding k-NN decisions at or above this calibrated probability of being right skip the Gemini call
+INTENT_THRESHOLD = float(os.getenv("ROUTER_INTENT_THRESHOLD", "0.8"))
+
+# Routing cache for LLM decisions; set ROUTER_CACHE_PATH to persist it across restarts
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "2048"))
+ROUTER_CACHE_TTL = float(os.getenv("ROUTER_CACHE_TTL", "3600"))
+ROUTER_CACHE_PATH = os.getenv("ROUTER_CACHE_PATH", "")
+
+_stats_lock = threading.Lock()
+_stats = {"fast_path": 0, "cache": 0, "knn": 0, "llm": 0, "fallback": 0}
+
+
+def _record(path: str):
+    with _stats_lock:
+        _stats[path] += 1
+
+
+def router_stats() -> dict:
+    """
+    Counts of queries routed by rules, the routing cache, k-NN, Gemini and the
+    local fallback used when Gemini fails, plus routing cache stats.
+    """
+    with _stats_lock:
+        total = sum(_stats.values())
+        stats = {
+            **_stats,
+            "total": total,
+            "fast_path_ratio": _stats["fast_path"] / total if total else 0.0,
+        }
+    stats["routing_cache"] = routing_cache.stats()
+    return stats
+
+
+# -------------------- Query Normalisation --------------------
+_SYNONYMS = {
+    "repositories": "repos", "repository": "repos", "repo": "repos",
+    "pull": "pr", "prs": "pr", "requests": "", "request": "",
+    "issue": "issues", "tasks": "task", "tickets": "ticket",
+    "show": "list", "get": "list", "display": "list", "give": "list",
+    "please": "", "me": "", "the": "", "all": "",
+}
+_POSSESSIVE_RE = re.compile(r"\b(\w+)(?:'s|’s|s')(?=\W|$)")
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9._-]*/[a-z0-9._-]+|[a-z0-9]+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query for routing-cache keys: lowercase, possessives and
+    punctuation stripped, common synonyms folded. owner/repo references are kept
+    intact. "List Alice's repositories?" and "list alice repos" map to the same key.
+    """
+    text = _POSSESSIVE_RE.sub(r"\1", query.lower())
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        token = _SYNONYMS.get(token, token)
+        if token:
+            tokens.append(token)
+    return " ".join(tokens)
+
+
+# -------------------- Routing Cache --------------------
+class RoutingCache:
+    """
+    LRU cache of routing decisions keyed by normalised query text.
+
+    Entries expire after a TTL and the least recently used are evicted past
+    max_entries. With a path set, the table is loaded on start and rewritten
+    atomically on every insert, so a restarted server keeps its warm routes.
+    """
+
+    def __init__(self, max_entries: int = ROUTER_CACHE_SIZE, ttl: float = ROUTER_CACHE_TTL,
+                 path: str = ROUTER_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # normalised query -> (decision, created), oldest use first
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            print("⚠️ Ignoring unreadable routing cache:", e)
+            return
+        now = time.time()
+        for key, decision, created in rows[-self.max_entries:]:
+            if now - created <= self.ttl:
+                self._entries[key] = (decision, created)
+
+    def _save(self):
+        if not self.path:
+            return
+        rows = [[k, d, c] for k, (d, c) in self._entries.items()]
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print("⚠️ Could not persist routing cache:", e)
+
+    def get(self, query: str):
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, decision: dict):
+        key = normalize_query(query)
+        if not key or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (dict(decision), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+routing_cache = RoutingCache()
+register_cache("routing", routing_cache.stats)
+
+
+def _decisions_by_path():
+    with _stats_lock:
+        return {(path,): n for path, n in _stats.items()}
+
+
+registry.callback("router_decisions_total", "Routing decisions by path (rules, cache, k-NN, LLM, fallback).",
+                  _decisions_by_path, ("path",), type="counter")
 
 # -------------------- LLM Call Wrapper --------------------
+@traced("router.llm")
 def call_llm(system_prompt: str, user_query: str) -> dict:
     """
     Calls Gemini for routing and returns parsed JSON dict.
     """
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    model = get_model(ROUTER_MODEL)
 
     try:
         # Combine system and user prompt as a single user message
         prompt = system_prompt.strip() + "\n" + user_query.strip()
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, timeout=ROUTER_LLM_TIMEOUT_S, hedge=ROUTER_LLM_HEDGE)
 
         text = response.text.strip()
         
@@ -42,19 +217,97 @@ def call_llm(system_prompt: str, user_query: str) -> dict:
         except json.JSONDecodeError as e:
             print("⚠️ Gemini returned non-JSON:", text)
             print(f"   Parse error: {e}")
-            return {"agent": "none", "user": "unknown", "repo": None}
+            return {"agent": "none", "user": "unknown", "repo": None, "error": "non-json"}
 
+    except CircuitOpenError as e:
+        return {"agent": "none", "user": "unknown", "repo": None, "error": str(e)}
     except Exception as e:
         print("❌ Gemini error:", e)
-        return {"agent": "none", "user": "unknown", "repo": None}
+        return {"agent": "none", "user": "unknown", "repo": None, "error": str(e)}
 
 
 # -------------------- Router Logic --------------------
 def route_to_agent(query: str):
     """
-    Sends query to Gemini and returns routing decision
+    Returns the routing decision for a query: agent, user, repo and, for plain
+    listings a single tool answers, an intent {"tool", "args"} that can be
+    dispatched without a CrewAI run.
+
+    Compound queries that address several agents or users ("Alice's PRs and
+    her Linear tasks") come back as agent "multi" with one decision per clause
+    in "intents", each carrying the clause text as "query". Single decisions
+    list themselves as their only intent.
+    """
+    with span("router.route_to_agent") as current:
+        decision = _route_multi(query) or _route_single(query)
+        current.set(agent=decision["agent"], intents=len(decision["intents"]))
+    return decision
+
+
+def _route_single(query: str) -> dict:
+    decision = _route(query)
+    decision["intent"] = detect_intent(query, decision["agent"])
+    decision["query"] = query
+    decision["intents"] = [dict(decision)]
+    return decision
+
+
+def _route_multi(query: str):
+    """
+    Fans a compound query out per clause, but only when the rules route every
+    clause confidently and the clauses target different agents or users;
+    otherwise returns None and the query is routed as a whole.
+    """
+    clauses = split_clauses(query)
+    if len(clauses) < 2:
+        return None
+
+    intents = []
+    for clause in clauses:
+        decision, confidence = classify(clause)
+        if confidence < FAST_PATH_THRESHOLD or decision["agent"] == "none":
+            return None
+        decision["intent"] = detect_intent(clause, decision["agent"])
+        decision["query"] = clause
+        intents.append(decision)
+
+    if len({(d["agent"], d["user"]) for d in intents}) < 2:
+        return None
+
+    _record("fast_path")
+    users = {d["user"] for d in intents}
+    return {"agent": "multi", "user": users.pop() if len(users) == 1 else "multiple", "repo": None,
+            "intent": None, "query": query, "intents": intents}
+
+
+def _route(query: str) -> dict:
+    """
+    Unambiguous queries are routed by the deterministic rules, then cached
+    decisions and the embedding k-NN classifier are tried; only what remains
+    ambiguous is sent to Gemini. If Gemini fails, the most confident local
+    decision is used.
     """
 
+    decision, confidence = classify(query)
+    if confidence >= FAST_PATH_THRESHOLD:
+        _record("fast_path")
+        return decision
+    local = (confidence, decision)
+
+    cached = routing_cache.get(query)
+    if cached is not None:
+        _record("cache")
+        return cached
+
+    try:
+        decision, confidence = intent_classifier.classify(query)
+        if confidence >= INTENT_THRESHOLD:
+            _record("knn")
+            return decision
+        local = max(local, (confidence, decision), key=lambda c: c[0])
+    except Exception as e:
+        print("⚠️ Intent classifier unavailable:", e)
+
     system_prompt = """
 You are a strict routing engine for a multi-agent system.
 
@@ -86,10 +339,18 @@ No explanation. No markdown. Only JSON.
 """
 
     result = call_llm(system_prompt, query)
+    if "error" in result:
+        # Gemini failed, timed out or its circuit is open: route locally
+        _record("fallback")
+        return local[1]
+    _record("llm")
 
     # Force safe keys
-    return {
+    decision = {
         "agent": result.get("agent", "none"),
         "user": result.get("user", "unknown"),
         "repo": result.get("repo", None)
-    }
\ No newline at end of file
+    }
+
+    routing_cache.put(query, decision)
+    return decision
\ No newline at end of file
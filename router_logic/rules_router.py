@@ -0,0 +1,229 @@
+import re
+
+# -------------------- Vocabulary --------------------
+USERS = ("alice", "bob")
+
+GITHUB_TERMS = [
+    r"github", r"repos?", r"repositor(?:y|ies)", r"pull requests?", r"prs?", r"stars?", r"starred",
+    r"commits?", r"branch(?:es)?", r"forks?",
+]
+LINEAR_TERMS = [
+    r"linear", r"issues?", r"tasks?", r"tickets?", r"sprints?", r"projects?", r"teams?", r"backlog",
+    r"priority", r"in[- ]progress", r"assigned",
+]
+CODE_TERMS = [
+    r"code", r"files?", r"functions?", r"class(?:es)?", r"methods?", r"implement(?:s|ed|ation)?",
+    r"explain", r"what does", r"how does", r"how is", r"where is", r"logic", r"modules?", r"defined",
+    r"readme", r"architecture", r"[\w-]+\.(?:py|js|jsx|ts|tsx|java|go|rs|rb|cpp|c|h|cs|php|md|ya?ml|json|sh|sql)",
+]
+# GitHub terms that, next to an explicit repo, ask for metadata rather than code
+REPO_METADATA_TERMS = [r"branch(?:es)?", r"commits?", r"pull requests?", r"prs?", r"stars?"]
+
+_GITHUB_RE = re.compile(r"\b(?:%s)\b" % "|".join(GITHUB_TERMS))
+_LINEAR_RE = re.compile(r"\b(?:%s)\b" % "|".join(LINEAR_TERMS))
+_CODE_RE = re.compile(r"\b(?:%s)\b" % "|".join(CODE_TERMS))
+_REPO_META_RE = re.compile(r"\b(?:%s)\b" % "|".join(REPO_METADATA_TERMS))
+_USER_RE = re.compile(r"\b(%s)(?:'s|’s|s')?\b" % "|".join(USERS))
+
+_REPO_RE = re.compile(
+    r"(?:(?<=github\.com/)|(?<![\w./-]))([A-Za-z0-9](?:[A-Za-z0-9-]{0,38}))/([A-Za-z0-9._-]{1,100})(?![\w/-])"
+)
+_ISSUE_RE = re.compile(r"\bissues?\b")
+_FILE_EXT_RE = re.compile(r"\.(?:py|js|jsx|ts|tsx|java|go|rs|rb|cpp|c|h|cs|php|md|ya?ml|json|sh|sql|txt)$", re.I)
+
+
+# -------------------- Extraction --------------------
+def detect_users(query: str):
+    """Returns the distinct known users mentioned in the query, in order of appearance."""
+    found = []
+    for m in _USER_RE.finditer(query.lower()):
+        if m.group(1) not in found:
+            found.append(m.group(1))
+    return found
+
+
+def extract_repo(query: str):
+    """Returns the first owner/repo reference (URLs included), ignoring file paths like src/main.py."""
+    for m in _REPO_RE.finditer(query):
+        owner, repo = m.group(1), m.group(2).rstrip(".")
+        if _FILE_EXT_RE.search(repo) or owner.lower() in ("and", "or"):
+            continue
+        if repo.endswith(".git"):
+            repo = repo[:-4]
+        return f"{owner}/{repo}"
+    return None
+
+
+# -------------------- Classifier --------------------
+def classify(query: str):
+    """
+    Rule-based routing. Returns ({"agent", "user", "repo"}, confidence in [0, 1]).
+    Only clear-cut queries get a high confidence; anything ambiguous scores low
+    so the caller can fall back to the LLM router.
+    """
+    text = query.lower()
+    users = detect_users(query)
+    repo = extract_repo(query)
+    user = users[0] if len(users) == 1 else "unknown"
+
+    github = len(_GITHUB_RE.findall(text))
+    linear = len(_LINEAR_RE.findall(text))
+    code = len(_CODE_RE.findall(text))
+    # "issue" alone is shared vocabulary: Linear by default, GitHub when GitHub is named
+    issues_only = linear and linear == len(_ISSUE_RE.findall(text))
+    explicit_github = "github" in text
+
+    if repo:
+        if code and not _REPO_META_RE.search(text):
+            agent, confidence = "github_rag", 0.95
+        elif _REPO_META_RE.search(text) and not code:
+            agent, confidence = "github", 0.9
+        else:
+            agent, confidence = "github_rag", 0.7
+    elif github and not linear:
+        agent, confidence = "github", 0.95
+    elif linear and not github:
+        agent, confidence = "linear", 0.95
+    elif github and issues_only and explicit_github:
+        agent, confidence = "github", 0.9
+    elif github and linear:
+        # Vocabulary from both platforms, e.g. "PRs and Linear tasks"
+        agent, confidence = "github", 0.4
+    elif code:
+        # Code question without a repository: the LLM may still find one
+        agent, confidence = "github_rag", 0.5
+    else:
+        agent, confidence = "none", 0.6 if users else 0.85
+
+    # Two different users in one query is never clear-cut
+    if len(users) > 1:
+        confidence = min(confidence, 0.5)
+
+    return {"agent": agent, "user": user, "repo": repo if agent == "github_rag" else None}, confidence
+
+
+# -------------------- Single-tool Intents --------------------
+# Keyword patterns for listing tools that need nothing but the user (and maybe a repo)
+GITHUB_TOOL_TERMS = {
+    "github_list_starred": r"starred|stars?",
+    "github_list_prs": r"pull requests?|prs?",
+    "github_list_branches": r"branch(?:es)?",
+    "github_list_commits": r"commits?",
+    "github_list_issues": r"issues?",
+    "github_list_repos": r"repos?|repositor(?:y|ies)",
+}
+LINEAR_TOOL_TERMS = {
+    "linear_in_progress": r"in[- ]progress",
+    "linear_high_priority": r"high[- ]priority|urgent",
+    "linear_teams": r"teams?",
+    "linear_projects": r"projects?",
+    "linear_list_issues": r"issues?|tasks?|tickets?",
+}
+# Tools that operate on one of the user's repositories
+REPO_TOOLS = {"github_list_branches", "github_list_commits"}
+# Tools whose term narrows a generic one ("starred repos", "in-progress issues")
+NARROWING_TOOLS = {"github_list_starred", "github_list_branches", "github_list_commits",
+                   "linear_in_progress", "linear_high_priority"}
+# Queries asking for more than a plain listing stay with the CrewAI agents
+OPEN_ENDED_TERMS = [
+    r"how many", r"count", r"number of", r"compare", r"summar\w*", r"why", r"most", r"least",
+    r"recommend\w*", r"analy[sz]\w*", r"create", r"update", r"close", r"delete", r"search", r"find",
+    r"and", r"or", r"but", r"except", r"without",
+]
+
+# Filters none of the listing tools take an argument for
+FILTER_TERMS = [
+    r"closed", r"merged", r"draft", r"done", r"completed", r"cancell?ed", r"archived", r"labell?ed", r"tagged",
+    r"assigned", r"created", r"opened", r"since", r"before", r"after", r"last", r"latest", r"recent\w*",
+    r"today", r"yesterday", r"this (?:week|month|year)", r"older", r"newer", r"named", r"called", r"about",
+    r"containing", r"matching",
+]
+# A preposition still followed by a word once users, tool terms and filler are removed
+# ("tasks in the Backend project", "PRs on the api repo") scopes the listing
+_SCOPE_RE = re.compile(r"\b(?:in|on|from|for|under|within|of|with|by|to|at)\s+\w")
+_FILLER_RE = re.compile(r"\b(?:the|a|an|my|our|me|any|all|github|linear|account|profile)\b|[?!.,]")
+
+_OPEN_ENDED_RE = re.compile(r"\b(?:%s)\b" % "|".join(OPEN_ENDED_TERMS))
+_FILTER_RE = re.compile(r"\b(?:%s)\b" % "|".join(FILTER_TERMS))
+_TOOL_RES = {
+    "github": {name: re.compile(r"\b(?:%s)\b" % p) for name, p in GITHUB_TOOL_TERMS.items()},
+    "linear": {name: re.compile(r"\b(?:%s)\b" % p) for name, p in LINEAR_TOOL_TERMS.items()},
+}
+
+
+def detect_intent(query: str, agent: str):
+    """
+    Returns {"tool": name, "args": {...}} when the query is a plain listing that
+    one tool answers on its own, otherwise None. Queries narrowed by something
+    the tool has no argument for (a repository, a project, a status or date
+    filter) return None too, so they reach an agent instead of an unfiltered
+    listing. The user argument is left to the caller, which knows the internal
+    user key.
+    """
+    if agent not in _TOOL_RES:
+        return None
+    text = query.lower()
+    if _OPEN_ENDED_RE.search(text) or _FILTER_RE.search(text):
+        return None
+
+    matches = [name for name, regex in _TOOL_RES[agent].items() if regex.search(text)]
+    # "starred repos", "branches of the repo", "issues in progress": the specific term wins
+    if (len(matches) == 2 and matches[-1] in ("github_list_repos", "linear_list_issues")
+            and matches[0] in NARROWING_TOOLS):
+        matches = matches[:-1]
+    if len(matches) != 1:
+        return None
+
+    tool = matches[0]
+    repo = extract_repo(query)
+    if (repo is not None) != (tool in REPO_TOOLS):
+        return None
+
+    rest = text.replace(repo.lower(), " ") if repo else text
+    rest = _USER_RE.sub(" ", rest)
+    for regex in _TOOL_RES[agent].values():
+        rest = regex.sub(" ", rest)
+    if _SCOPE_RE.search(_FILLER_RE.sub(" ", rest)):
+        return None
+
+    if tool not in REPO_TOOLS:
+        return {"tool": tool, "args": {}}
+    # The GitHub service resolves repository names under the user's own account
+    return {"tool": tool, "args": {"repo_name": repo.split("/", 1)[1]}}
+
+
+# -------------------- Multi-intent Queries --------------------
+_CLAUSE_SPLIT_RE = re.compile(r"\s*(?:;|,?\s+\b(?:and also|as well as|and then|plus|also|and)\b)\s+", re.I)
+_POSSESSIVE_PRONOUN_RE = re.compile(r"\b(?:her|his|their)\b", re.I)
+_SUBJECT_PRONOUN_RE = re.compile(r"\b(?:she|he|they)\b", re.I)
+
+
+def split_clauses(query: str):
+    """
+    Splits a compound query ("Alice's open PRs and her Linear tasks") into
+    clauses that can each be routed alone. A clause without a user of its own
+    gets the query's only user, wherever it is named ("open PRs and Linear
+    tasks for Alice"); with several users it inherits the previous clause's.
+    Pronouns are replaced by the name. Returns [query] unchanged when there
+    is nothing to split.
+    """
+    parts = [p.strip(" ,.?!") for p in _CLAUSE_SPLIT_RE.split(query)]
+    parts = [p for p in parts if p]
+    if len(parts) < 2:
+        return [query]
+
+    named = detect_users(query)
+    clauses = []
+    user = named[0] if len(named) == 1 else None
+    for part in parts:
+        users = detect_users(part)
+        if users:
+            user = users[-1]
+        elif user:
+            name = user.capitalize()
+            part = _POSSESSIVE_PRONOUN_RE.sub(f"{name}'s", part)
+            part = _SUBJECT_PRONOUN_RE.sub(name, part)
+            if not detect_users(part):
+                part = f"{part} for {name}"
+        clauses.append(part)
+    return clauses
@@ -0,0 +1,182 @@
+import os
+import math
+import asyncio
+import threading
+import time
+from contextvars import copy_context
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics import registry
+from profiling import profiled_thread
+
+# Lanes for blocking work: (default workers, default queue depth, status when full).
+# A full agent lane is the client's to back off from (429); a full routing lane
+# means the whole service is saturated (503).
+LANE_DEFAULTS = {
+    "routing": (8, 32, 503),
+    "github": (8, 32, 429),
+    "linear": (8, 32, 429),
+    "github_rag": (4, 8, 429),
+}
+
+
+class LaneFull(Exception):
+    """Raised when a lane's queue is full; carries the HTTP status and a Retry-After hint."""
+
+    def __init__(self, lane: str, status_code: int, retry_after: int):
+        super().__init__(f"Too many pending {lane} requests, retry in {retry_after}s")
+        self.lane = lane
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Bounded thread pool for one kind of blocking work.
+
+    At most `workers` calls run at once and at most `max_queue` more wait for a
+    thread; anything beyond that is rejected with LaneFull instead of queueing,
+    so latency stays bounded under load. Threads rather than processes, since
+    CrewAI agents, GitHub clients and vector stores aren't picklable.
+
+    Work run on the caller's own thread (streaming responses) takes a slot()
+    instead; it shares the `workers` limit with the pool through a semaphore.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int, status_code: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.status_code = status_code
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"lane-{name}")
+        self.rejected = 0
+        self._inflight = 0
+        self._running = 0
+        self._avg_s = 1.0   # moving average of call duration, for Retry-After
+        self._lock = threading.Lock()
+        self._workers = threading.BoundedSemaphore(workers)
+
+    def _admit(self):
+        # Caller holds self._lock
+        if self._inflight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise LaneFull(self.name, self.status_code, self._retry_after())
+
+    def acquire(self):
+        with self._lock:
+            self._admit()
+            self._inflight += 1
+
+    def check(self):
+        """Raises LaneFull if the lane is full right now, without taking a slot."""
+        with self._lock:
+            self._admit()
+
+    def release(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def _retry_after(self) -> int:
+        waiting = max(0, self._inflight - self.workers)
+        return max(1, math.ceil(waiting / self.workers * self._avg_s))
+
+    def _start(self) -> float:
+        # Blocks while `workers` calls (pool or slot) are already running
+        self._workers.acquire()
+        with self._lock:
+            self._running += 1
+        return time.monotonic()
+
+    def _finish(self, start: float):
+        with self._lock:
+            self._running -= 1
+            self._avg_s = 0.9 * self._avg_s + 0.1 * (time.monotonic() - start)
+        self._workers.release()
+
+    def _timed(self, fn, args, kwargs):
+        start = self._start()
+        try:
+            with profiled_thread():
+                return fn(*args, **kwargs)
+        finally:
+            self._finish(start)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Schedules fn(*args, **kwargs) on the lane's pool and returns its Future;
+        the slot is released when the call finishes or is cancelled. The
+        caller's context (e.g. the current trace span) is carried into the
+        worker thread. Raises LaneFull.
+        """
+        self.acquire()
+        try:
+            future = self.executor.submit(copy_context().run, self._timed, fn, args, kwargs)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the lane's pool and awaits the result. Raises LaneFull."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def slot(self):
+        """
+        Context manager holding one lane slot for work run on the caller's own
+        thread: admission as for run(), then a wait for a free worker.
+        """
+        return _Slot(self)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": max(0, self._inflight - self._running),
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+            }
+
+
+class _Slot:
+    def __init__(self, lane: Lane):
+        self.lane = lane
+
+    def __enter__(self):
+        self.lane.acquire()
+        try:
+            self._start = self.lane._start()
+        except BaseException:
+            self.lane.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.lane._finish(self._start)
+        self.lane.release()
+
+
+def _build_lanes():
+    lanes = {}
+    for name, (workers, queue, status) in LANE_DEFAULTS.items():
+        workers = int(os.getenv(f"EXECUTOR_{name.upper()}_WORKERS", workers))
+        queue = int(os.getenv(f"EXECUTOR_{name.upper()}_QUEUE", queue))
+        lanes[name] = Lane(name, workers, queue, status)
+    return lanes
+
+
+lanes = _build_lanes()
+
+
+def lane_stats() -> dict:
+    return {name: lane.stats() for name, lane in lanes.items()}
+
+
+def _lane_values(field: str):
+    return lambda: {(name,): stats[field] for name, stats in lane_stats().items()}
+
+
+registry.callback("executor_queue_depth", "Requests waiting for a lane thread.", _lane_values("queued"), ("lane",))
+registry.callback("executor_running", "Requests running on a lane.", _lane_values("running"), ("lane",))
+registry.callback("executor_rejected_total", "Requests rejected by lane admission control.",
+                  _lane_values("rejected"), ("lane",), type="counter")
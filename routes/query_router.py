@@ -1,15 +1,36 @@
-from fastapi import APIRouter, Body
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeout
+from fastapi import APIRouter, Body, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from github import GithubException, UnknownObjectException
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 # ---- Import your agent runners here ----
-from agents.github_agent import run_github_agent
-from agents.linear_agent import run_linear_agent
+from agents.github_agent import run_github_agent, arun_github_agent
+from agents.linear_agent import run_linear_agent, arun_linear_agent
+from agents.direct_dispatch import can_dispatch, run_direct
 from router_logic.llm_router import route_to_agent   # Your LLM routing function
-from tools.github_rag import github_repo_qa_direct  # Import RAG function (not the tool)
+from tools.github_rag import github_repo_qa_direct, github_repo_qa_stream, start_repo_indexing  # Import RAG function (not the tool)
+from rag.indexing_jobs import index_jobs, JobQueueFull
+from routes.executors import lanes, LaneFull
+from litellm_wrapper import LLMCallError
+from metrics import QUERY_REQUESTS, QUERY_LATENCY
+from profiling import profile_requested, request_profile
 
 router = APIRouter()
 
+# Multi-intent queries: all branches share this deadline, slow ones are reported as timed out
+FANOUT_DEADLINE_S = float(os.getenv("FANOUT_DEADLINE_S", "60"))
+
+# Agent runs /query awaits on the event loop (async LLM calls) instead of a lane thread.
+# ASYNC_AGENTS=0 falls back to CrewAI kickoff on the lane.
+ASYNC_AGENTS = os.getenv("ASYNC_AGENTS", "1") == "1"
+ASYNC_RUNNERS = {"github": arun_github_agent, "linear": arun_linear_agent}
+
 # Add this mapping at the top of query_router.py
 USER_MAP = {
     "alice": "user1",
@@ -25,60 +46,236 @@ class QueryResponse(BaseModel):
     user: str
     repo: Optional[str] = None
     result: Any
+    results: Optional[List[Dict[str, Any]]] = None
+    profile_id: Optional[str] = None
 
+# Background indexing request
+class IndexRequest(BaseModel):
+    user: str
+    repo: str
 
-@router.post("/query", response_model=QueryResponse)
-async def handle_query(request: QueryRequest):
-    """
-    Accepts user query, routes to correct agent via LLM, returns agent result.
-    """
-    query = request.query
 
-    # 🔥 Call the LLM router (it returns agent + user + repo)
-    routing_decision: Dict[str, str] = route_to_agent(query)
-    agent = routing_decision.get("agent")
-    user = routing_decision.get("user")
-    repo = routing_decision.get("repo")
-    
+def _precheck(agent: str, user: str) -> Optional[str]:
+    """Returns a canned reply when the query can't be handed to an agent."""
     # Check if query is unrelated to GitHub or Linear
     if agent == "none":
-        return QueryResponse(
-            agent=agent,
-            user=user,
-            repo=repo,
-            result="I cannot answer this question."
-        )
+        return "I cannot answer this question."
     
     # Check if user is ambiguous (unknown) for GitHub/Linear queries
     if user == "unknown" and agent in ["github", "github_rag", "linear"]:
-        return QueryResponse(
-            agent=agent,
-            user=user,
-            repo=repo,
-            result="Please specify which user (Alice or Bob) you're asking about."
-        )
-    
-    user_key = USER_MAP.get(user, user)  # defaults to original if not found
+        return "Please specify which user (Alice or Bob) you're asking about."
+    return None
+
 
+def _overloaded(e: LaneFull) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e),
+                         headers={"Retry-After": str(e.retry_after)})
+
+
+def _llm_failed(e: LLMCallError) -> HTTPException:
+    """Maps an agent's failed LLM call to a gateway error instead of a fake answer."""
+    if e.status_code == 408:
+        return HTTPException(status_code=504, detail=str(e))
+    if e.retryable:
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return HTTPException(status_code=502, detail=str(e))
+
+
+def _record_query(observed: dict, start: float):
+    """observed holds the routed agent ("unrouted" before routing) and the outcome."""
+    QUERY_REQUESTS.inc(agent=observed["agent"], outcome=observed["outcome"])
+    QUERY_LATENCY.observe(time.perf_counter() - start, agent=observed["agent"])
+
+
+def _raw(result):
+    # Extract raw text from CrewAI result
+    if isinstance(result, dict) and 'raw' in result:
+        return result['raw']
+    elif hasattr(result, 'raw'):
+        return result.raw
+    return result
+
+
+def _answer(agent: str, user_key: str, repo, intent, query: str):
+    """Answers one routed query on the calling (lane) thread."""
+    if agent in ("github", "linear") and can_dispatch(intent):
+        # Single-tool listing: call the tool directly, skipping the CrewAI run
+        return run_direct(intent, user_key)
     if agent == "github":
-        result = run_github_agent(query, user_key)
-        # Extract raw text from CrewAI result
-        if isinstance(result, dict) and 'raw' in result:
-            result = result['raw']
-        elif hasattr(result, 'raw'):
-            result = result.raw
-    elif agent == "github_rag" and repo:
+        return _raw(run_github_agent(query, user_key))
+    if agent == "github_rag" and repo:
         # RAG-based repo Q&A - use the direct function
-        result = github_repo_qa_direct(user_key, repo, query)
-    elif agent == "linear":
-        result = run_linear_agent(query, user_key)
-        # Extract raw text from CrewAI result
-        if isinstance(result, dict) and 'raw' in result:
-            result = result['raw']
-        elif hasattr(result, 'raw'):
-            result = result.raw
+        return github_repo_qa_direct(user_key, repo, query)
+    if agent == "linear":
+        return _raw(run_linear_agent(query, user_key))
+    return "I cannot answer this question."
+
+
+async def _aanswer(agent: str, user_key: str, repo, intent, query: str):
+    """
+    Answers one routed query for /query. Agent runs await their LLM calls on
+    the event loop and only take a lane thread for each tool call; direct
+    dispatch and RAG run on the agent's lane as before. Raises LaneFull.
+    """
+    lane = lanes[agent]
+    if ASYNC_AGENTS and agent in ASYNC_RUNNERS and not can_dispatch(intent):
+        lane.check()
+        return await ASYNC_RUNNERS[agent](query, user_key, run_blocking=lane.run)
+    return await lane.run(_answer, agent, user_key, repo, intent, query)
+
+
+# -------------------- Multi-Intent Fan-Out --------------------
+def _branches(intents) -> tuple:
+    """
+    One result dict per branch of a multi-intent decision, the declined ones
+    already filled in; returns (branches, indexes of the answerable ones).
+    """
+    branches, answerable = [], []
+    for i, decision in enumerate(intents):
+        agent, user, repo = decision["agent"], decision["user"], decision.get("repo")
+        branches.append({"agent": agent, "user": user, "repo": repo, "query": decision["query"],
+                         "status": "pending", "result": None})
+        message = _precheck(agent, user)
+        if message or agent not in lanes:
+            branches[i].update(status="declined", result=message or "I cannot answer this question.")
+            continue
+        answerable.append(i)
+    return branches, answerable
+
+
+def _submit_branches(intents) -> tuple:
+    """
+    Starts every answerable branch of a multi-intent decision on its agent's
+    lane. Returns (branches, futures): one result dict per branch, with the
+    declined and rejected ones already filled in, and {future: branch index}.
+    """
+    branches, answerable = _branches(intents)
+    futures = {}
+    for i in answerable:
+        decision, branch = intents[i], branches[i]
+        agent, user = decision["agent"], decision["user"]
+        try:
+            future = lanes[agent].submit(_answer, agent, USER_MAP.get(user, user), decision.get("repo"),
+                                         decision.get("intent"), decision["query"])
+        except LaneFull as e:
+            branch.update(status="rejected", result=str(e))
+            continue
+        futures[future] = i
+    return branches, futures
+
+
+def _settle(branch: dict, future):
+    """Fills a branch in from its finished future (or asyncio task)."""
+    error = future.exception()
+    if error is None:
+        branch.update(status="ok", result=str(future.result()))
+    elif isinstance(error, LaneFull):
+        branch.update(status="rejected", result=str(error))
+    elif isinstance(error, LLMCallError):
+        branch.update(status="error", result=f"LLM call failed: {error}")
     else:
-        result = "I cannot answer this question."
+        branch.update(status="error", result=f"{type(error).__name__}: {error}")
+
+
+def _time_out(branches, futures):
+    """Marks branches still running at the deadline; queued ones are cancelled."""
+    for future, i in futures.items():
+        if branches[i]["status"] == "pending":
+            future.cancel()
+            branches[i].update(status="timeout",
+                               result=f"No answer within {FANOUT_DEADLINE_S:g}s.")
+
+
+def _merge(branches) -> str:
+    """One markdown section per branch, in the order the query asked for them."""
+    sections = []
+    for branch in branches:
+        heading = f"### {branch['agent'].replace('_', ' ').title()} ({branch['user']}): {branch['query']}"
+        body = branch["result"] if branch["status"] == "ok" else f"⚠️ {branch['status']}: {branch['result']}"
+        sections.append(f"{heading}\n\n{body}")
+    return "\n\n".join(sections)
+
+
+def _fan_out_outcome(branches) -> str:
+    if any(b["status"] == "ok" for b in branches):
+        return "ok"
+    if all(b["status"] == "declined" for b in branches):
+        return "declined"
+    return "rejected" if any(b["status"] == "rejected" for b in branches) else "error"
+
+
+async def _fan_out(intents) -> list:
+    """Answers the branches concurrently, each as its own task, within FANOUT_DEADLINE_S."""
+    branches, answerable = _branches(intents)
+    tasks = {}
+    for i in answerable:
+        decision = intents[i]
+        user = decision["user"]
+        tasks[asyncio.ensure_future(_aanswer(decision["agent"], USER_MAP.get(user, user), decision.get("repo"),
+                                             decision.get("intent"), decision["query"]))] = i
+    if tasks:
+        done, _ = await asyncio.wait(tasks, timeout=FANOUT_DEADLINE_S)
+        for task in done:
+            _settle(branches[tasks[task]], task)
+        _time_out(branches, tasks)
+    return branches
+
+
+@router.post("/query", response_model=QueryResponse)
+async def handle_query(request: QueryRequest, http_request: Request, response: Response):
+    """
+    Accepts user query, routes to correct agent via LLM, returns agent result.
+    Blocking work runs on per-agent executor lanes so the event loop stays free;
+    a full lane answers 429/503 with Retry-After. Requests carrying the profiling
+    token (X-Profile header or ?profile=) are sampled and get a profile_id back.
+    """
+    enabled = profile_requested(http_request.headers, http_request.query_params)
+    with request_profile(enabled) as profiler:
+        result = await _handle_query(request.query)
+    if profiler:
+        result.profile_id = profiler.id
+        response.headers["X-Profile-Id"] = profiler.id
+    return result
+
+
+async def _handle_query(query: str) -> QueryResponse:
+    start = time.perf_counter()
+    observed = {"agent": "unrouted", "outcome": "error"}
+
+    try:
+        # 🔥 Call the LLM router (it returns agent + user + repo)
+        routing_decision: Dict[str, str] = await lanes["routing"].run(route_to_agent, query)
+        agent = routing_decision.get("agent")
+        user = routing_decision.get("user")
+        repo = routing_decision.get("repo")
+        intent = routing_decision.get("intent")
+        observed["agent"] = agent
+        
+        message = _precheck(agent, user)
+        if message:
+            observed["outcome"] = "declined"
+            return QueryResponse(agent=agent, user=user, repo=repo, result=message)
+        
+        if agent == "multi":
+            # Compound query: answer each clause on its own lane, concurrently
+            branches = await _fan_out(routing_decision["intents"])
+            observed["outcome"] = _fan_out_outcome(branches)
+            return QueryResponse(agent=agent, user=user, repo=repo, result=_merge(branches), results=branches)
+
+        user_key = USER_MAP.get(user, user)  # defaults to original if not found
+
+        if agent in lanes:
+            result = await _aanswer(agent, user_key, repo, intent, query)
+        else:
+            result = "I cannot answer this question."
+        observed["outcome"] = "ok"
+    except LaneFull as e:
+        observed["outcome"] = "rejected"
+        raise _overloaded(e)
+    except LLMCallError as e:
+        raise _llm_failed(e)
+    finally:
+        _record_query(observed, start)
 
     return QueryResponse(
         agent=agent,
@@ -86,3 +283,154 @@ async def handle_query(request: QueryRequest):
         repo=repo,
         result=result
     )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _stream_query(query: str):
+    """
+    Yields Server-Sent Events for one query: routing, progress, tokens, result, done.
+    Holds a routing lane slot while routing, then one in the agent's lane while answering.
+    Multi-intent queries emit a "branch" event per clause as each one finishes.
+    A client that disconnects closes the generator; the query is recorded as cancelled.
+    """
+    start = time.perf_counter()
+    observed = {"agent": "unrouted", "outcome": "error"}
+    try:
+        yield from _stream_events(query, observed)
+    except GeneratorExit:
+        observed["outcome"] = "cancelled"
+        raise
+    finally:
+        _record_query(observed, start)
+    yield _sse("done", {})
+
+
+def _stream_events(query: str, observed: dict):
+    """The events of _stream_query up to its result (or error), filling in observed."""
+    try:
+        yield _sse("progress", {"stage": "routing"})
+        with lanes["routing"].slot():
+            routing_decision = route_to_agent(query)
+        agent = routing_decision.get("agent")
+        observed["agent"] = agent
+        user = routing_decision.get("user")
+        repo = routing_decision.get("repo")
+        intent = routing_decision.get("intent")
+        intents = routing_decision.get("intents") or []
+        yield _sse("routing", {"agent": agent, "user": user, "repo": repo, "intent": intent,
+                               "intents": [{k: d.get(k) for k in ("agent", "user", "repo", "query")} for d in intents]})
+
+        message = _precheck(agent, user)
+        user_key = USER_MAP.get(user, user)
+        
+        branches = None
+        if agent == "multi":
+            branches = yield from _stream_fan_out(intents)
+            result = _merge(branches)
+            observed["outcome"] = _fan_out_outcome(branches)
+        elif message:
+            result = message
+            observed["outcome"] = "declined"
+        elif agent in lanes and (agent != "github_rag" or repo):
+            with lanes[agent].slot():
+                result = yield from _stream_agent(query, agent, user_key, repo, intent)
+            observed["outcome"] = "ok"
+        else:
+            result = "I cannot answer this question."
+            observed["outcome"] = "declined"
+        
+        yield _sse("result", {"agent": agent, "user": user, "repo": repo, "result": result, "results": branches})
+    except LaneFull as e:
+        observed["outcome"] = "rejected"
+        yield _sse("error", {"error": str(e), "retry_after": e.retry_after})
+    except LLMCallError as e:
+        yield _sse("error", {"error": str(e), "status_code": e.status_code, "retryable": e.retryable})
+    except Exception as e:
+        yield _sse("error", {"error": str(e)})
+
+
+def _stream_fan_out(intents):
+    """Runs the branches concurrently, yielding a "branch" event as each settles; returns them all."""
+    branches, futures = _submit_branches(intents)
+    for branch in branches:
+        if branch["status"] != "pending":
+            yield _sse("branch", branch)
+    try:
+        for future in as_completed(futures, timeout=FANOUT_DEADLINE_S):
+            branch = branches[futures[future]]
+            _settle(branch, future)
+            yield _sse("branch", branch)
+    except FuturesTimeout:
+        _time_out(branches, futures)
+        for future, i in futures.items():
+            if branches[i]["status"] == "timeout":
+                yield _sse("branch", branches[i])
+    return branches
+
+
+def _stream_agent(query: str, agent: str, user_key: str, repo, intent):
+    """Runs one agent for the stream, yielding its events; returns the final result text."""
+    if agent == "github_rag":
+        parts = []
+        for event, data in github_repo_qa_stream(user_key, repo, query):
+            if event == "token":
+                parts.append(data)
+            yield _sse(event, data)
+        return "".join(parts)
+    if can_dispatch(intent):
+        yield _sse("progress", {"stage": "tool", "tool": intent["tool"]})
+        return run_direct(intent, user_key)
+    # CrewAI runs don't stream tokens; report progress, then the final result
+    yield _sse("progress", {"stage": "agent", "agent": agent})
+    runner = run_github_agent if agent == "github" else run_linear_agent
+    return str(_raw(runner(query, user_key)))
+
+
+@router.post("/query/stream")
+def handle_query_stream(request: QueryRequest):
+    """
+    Streaming variant of /query using Server-Sent Events. Emits the routing
+    decision, progress events and RAG answer tokens as they are produced.
+    Admission is checked before the stream starts, so overload is a plain 503.
+    """
+    try:
+        lanes["routing"].check()
+    except LaneFull as e:
+        raise _overloaded(e)
+    return StreamingResponse(
+        _stream_query(request.query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/index")
+def start_index(request: IndexRequest):
+    """
+    Starts indexing a repository at its head commit in the background.
+    Returns the job (an existing one if that repo@commit is already queued or running).
+    """
+    user_key = USER_MAP.get(request.user.lower(), request.user.lower())
+    try:
+        job = start_repo_indexing(user_key, request.repo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnknownObjectException:
+        raise HTTPException(status_code=404, detail=f"Repository {request.repo} not found")
+    except GithubException as e:
+        raise HTTPException(status_code=400, detail=f"GitHub rejected the request: {e.status} {e.data}")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return job.to_dict()
+
+
+@router.get("/index/{job_id}")
+def index_status(job_id: str):
+    """Returns status and progress of an indexing job."""
+    job = index_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown indexing job {job_id}")
+    return job.to_dict()
@@ -0,0 +1,125 @@
+import os
+import time
+import queue
+import itertools
+import threading
+from concurrent.futures import Future
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from tracing import traced
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "10"))
+
+# Interactive requests (query embeddings) jump ahead of bulk ingestion work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+class EmbeddingService:
+    """
+    Process-wide sentence embedder with a micro-batching queue.
+
+    The model is loaded once, on first use. A single worker thread drains the
+    queue and coalesces concurrent encode() calls into one model.encode batch,
+    waiting at most max_wait_ms for more work once a request is pending.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, max_batch: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"requests": 0, "texts": 0, "batches": 0}
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queue = queue.PriorityQueue()
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    @property
+    def model(self) -> SentenceTransformer:
+        with self._model_lock:
+            if self._model is None:
+                print(f"Loading embedding model: {self.model_name}")
+                self._model = SentenceTransformer(self.model_name)
+            return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @traced("embedding.encode")
+    def encode(self, texts, interactive: bool = True, timeout: float = None) -> np.ndarray:
+        """
+        Embeds a list of texts and returns a (len(texts), dim) float32 array of
+        normalised vectors. Large requests are split into max_batch slices so
+        they interleave with other callers instead of monopolising the model.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        priority = PRIORITY_INTERACTIVE if interactive else PRIORITY_BULK
+        futures = []
+        for i in range(0, len(texts), self.max_batch):
+            future = Future()
+            self._queue.put((priority, next(self._seq), texts[i:i + self.max_batch], future))
+            futures.append(future)
+
+        return np.concatenate([f.result(timeout) for f in futures])
+
+    # -------------------- Worker --------------------
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][2])
+            deadline = time.monotonic() + self.max_wait
+
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[2])
+
+            self._encode_batch(pending)
+
+    def _encode_batch(self, pending):
+        texts = [t for _, _, batch, _ in pending for t in batch]
+        try:
+            vectors = self.model.encode(texts, batch_size=self.max_batch, convert_to_numpy=True,
+                                        normalize_embeddings=True).astype(np.float32)
+        except Exception as e:
+            for _, _, _, future in pending:
+                future.set_exception(e)
+            return
+
+        # Only the worker thread touches stats, so plain counters are safe
+        self.stats["requests"] += len(pending)
+        self.stats["texts"] += len(texts)
+        self.stats["batches"] += 1
+        offset = 0
+        for _, _, batch, future in pending:
+            future.set_result(vectors[offset:offset + len(batch)])
+            offset += len(batch)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Returns the shared EmbeddingService, creating it on first call."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
@@ -1,5 +1,20 @@
 import os
+import functools
 from github import Github
+from tracing import traced
+from metrics import GITHUB_RATE_LIMIT
+
+
+def _tracks_rate_limit(fn):
+    """Publishes the token's remaining rate limit, as reported by the call's responses."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        result = fn(self, *args, **kwargs)
+        remaining, _ = self.client.rate_limiting
+        GITHUB_RATE_LIMIT.set(remaining, user=self.user_key)
+        return result
+    return wrapper
+
 
 class GitHubService:
     def __init__(self, user_id: str):
@@ -12,32 +27,47 @@ class GitHubService:
 
         self.client = Github(token)
         self.username = username
+        self.user_key = user_key
 
+    @traced("github.list_repos")
+    @_tracks_rate_limit
     def list_repos(self):
         user = self.client.get_user(self.username)
         return [repo.full_name for repo in user.get_repos()]
 
+    @traced("github.list_starred_repos")
+    @_tracks_rate_limit
     def list_starred_repos(self):
         user = self.client.get_user(self.username)
         return [repo.full_name for repo in user.get_starred()]
 
+    @traced("github.list_issues")
+    @_tracks_rate_limit
     def list_issues(self):
         user = self.client.get_user(self.username)
         issues = user.get_issues()
         return [{"title": i.title, "repo": i.repository.name, "state": i.state} for i in issues]
 
+    @traced("github.list_branches")
+    @_tracks_rate_limit
     def list_branches(self, repo_name: str):
         repo = self.client.get_repo(f"{self.username}/{repo_name}")
         return [branch.name for branch in repo.get_branches()]
 
+    @traced("github.list_commits")
+    @_tracks_rate_limit
     def list_commits(self, repo_name: str):
         repo = self.client.get_repo(f"{self.username}/{repo_name}")
         return [{"message": c.commit.message, "sha": c.sha[:7]} for c in repo.get_commits()]
 
+    @traced("github.search_repositories")
+    @_tracks_rate_limit
     def search_repositories(self, query: str):
         results = self.client.search_repositories(query)
         return [repo.full_name for repo in results[:10]]
 
+    @traced("github.list_prs")
+    @_tracks_rate_limit
     def list_prs(self):
         repos = self.list_repos()
         all_prs = []
@@ -45,7 +75,7 @@ class GitHubService:
             try:
                 repo = self.client.get_repo(repo_name)
                 prs = repo.get_pulls(state="open")
-                all_prs.extend([f"{repo_name}: {pr.title}" for pr in prs])
+                all_prs.extend([{"title": pr.title, "repo": repo_name, "number": pr.number} for pr in prs])
             except:
                 pass
         return all_prs
@@ -1,5 +1,6 @@
 import os
 import requests
+from tracing import traced
 
 class LinearService:
     BASE_URL = "https://api.linear.app/graphql"
@@ -12,6 +13,7 @@ class LinearService:
         if not self.api_key or not self.email:
             raise ValueError(f"Missing Linear credentials for {user_key}")
 
+    @traced("linear.graphql")
     def query(self, query_string):
         headers = {
             "Authorization": self.api_key,
@@ -21,6 +23,7 @@ class LinearService:
         r = requests.post(self.BASE_URL, json=data, headers=headers)
         return r.json()
 
+    @traced("linear.list_in_progress")
     def list_in_progress(self):
         query = f"""
         query {{
@@ -34,6 +37,7 @@ class LinearService:
         """
         return self.query(query)
 
+    @traced("linear.list_high_priority")
     def list_high_priority(self):
         query = f"""
         query {{
@@ -47,12 +51,15 @@ class LinearService:
         """
         return self.query(query)
 
+    @traced("linear.list_teams")
     def list_teams(self):
         return self.query("""{ teams { nodes { id name }}}""")
 
+    @traced("linear.list_projects")
     def list_projects(self):
         return self.query("""{ projects { nodes { id name state }}}""")
 
+    @traced("linear.list_issues")
     def list_issues(self):
         query = f"""
         query {{
@@ -65,6 +72,7 @@ class LinearService:
         """
         return self.query(query)
 
+    @traced("linear.create_issue")
     def create_issue(self, title: str, desc: str):
         mutation = f"""
         mutation {{
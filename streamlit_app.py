@@ -31,8 +31,25 @@ st.set_page_config(
     layout="wide"
 )
 
-# API endpoint
+# API endpoints
 API_URL = "http://127.0.0.1:8002/api/query"
+STREAM_URL = "http://127.0.0.1:8002/api/query/stream"
+
+
+def iter_sse(response):
+    """Parses a text/event-stream response into (event, data) pairs"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
 
 # Custom CSS for styling
 st.markdown("""
@@ -191,97 +208,113 @@ if query:
     with st.chat_message("user"):
         st.markdown(query)
     
-    # Show assistant response with streaming effect
+    # Show assistant response, rendering server-sent events as they arrive
     with st.chat_message("assistant"):
-        with st.spinner("🤔 Thinking..."):
-            try:
-                # Make API request
-                response = requests.post(
-                    API_URL,
-                    json={"query": query},
-                    timeout=120
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    agent = data.get("agent", "unknown")
-                    user = data.get("user", "unknown")
-                    repo = data.get("repo")
-                    result = data.get("result", "No response")
-                    
-                    # Format the result properly
-                    formatted_result = format_result(result)
-                    
-                    # Simulate thoughts/logs (in a real scenario, you'd capture actual logs)
-                    thoughts = f"""
-Routing query to {agent} agent...
-Detected user: {user}
-{f"Repository: {repo}" if repo else "No repository specified"}
-Processing request...
-Generating response...
-                    """.strip()
-                    
-                    # Display thoughts
-                    st.markdown(f"""
-                    <div class="thoughts-container">
-                        <div class="thoughts-title">💭 Agent Thoughts</div>
-                        <div class="thoughts-content">{thoughts}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Display final response
-                    st.markdown(f"""
-                    <div class="final-response">
-                        <div class="response-title">📝 Final Response</div>
-                        <div class="response-content">{formatted_result}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Display metadata
-                    st.markdown(f"""
-                    <div class="metadata">
-                        <strong>Agent:</strong> {agent} | 
-                        <strong>User:</strong> {user}
-                        {f" | <strong>Repo:</strong> {repo}" if repo else ""}
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Save to session state
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": result,
-                        "thoughts": thoughts,
-                        "metadata": {
-                            "agent": agent,
-                            "user": user,
-                            "repo": repo
-                        }
-                    })
-                    
-                else:
-                    error_msg = f"Error {response.status_code}: {response.text}"
-                    st.markdown(f'<div class="error-message">❌ {error_msg}</div>', unsafe_allow_html=True)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": error_msg
-                    })
-                    
-            except requests.exceptions.ConnectionError:
-                error_msg = "Cannot connect to the API server. Please make sure the FastAPI server is running on http://127.0.0.1:8001"
-                st.markdown(f'<div class="error-message">❌ {error_msg}</div>', unsafe_allow_html=True)
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": error_msg
-                })
+        thoughts_placeholder = st.empty()
+        response_placeholder = st.empty()
+        thoughts_lines = ["Routing query..."]
+        answer = ""
+        
+        def render_thoughts():
+            thoughts_placeholder.markdown(f"""
+            <div class="thoughts-container">
+                <div class="thoughts-title">💭 Agent Thoughts</div>
+                <div class="thoughts-content">{"<br>".join(html.escape(t) for t in thoughts_lines)}</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        def render_answer(text):
+            response_placeholder.markdown(f"""
+            <div class="final-response">
+                <div class="response-title">📝 Final Response</div>
+                <div class="response-content">{format_result(text)}</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        try:
+            render_thoughts()
+            agent, user, repo, result = "unknown", "unknown", None, None
+            
+            # Make streaming API request (no read timeout per event beyond 300s)
+            with requests.post(STREAM_URL, json={"query": query}, stream=True, timeout=(10, 300)) as response:
+                if response.status_code in (429, 503):
+                    retry = response.headers.get("Retry-After", "a few")
+                    raise RuntimeError(f"The assistant is busy right now, please retry in {retry} seconds.")
+                if response.status_code != 200:
+                    raise RuntimeError(f"Error {response.status_code}: {response.text}")
                 
-            except Exception as e:
-                error_msg = f"An error occurred: {str(e)}"
-                st.markdown(f'<div class="error-message">❌ {error_msg}</div>', unsafe_allow_html=True)
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": error_msg
-                })
+                for event, data in iter_sse(response):
+                    if event == "routing":
+                        agent, user, repo = data.get("agent"), data.get("user"), data.get("repo")
+                        thoughts_lines.append(f"Routing query to {agent} agent...")
+                        thoughts_lines.append(f"Detected user: {user}")
+                        thoughts_lines.append(f"Repository: {repo}" if repo else "No repository specified")
+                        if data.get("intent"):
+                            thoughts_lines.append(f"Direct tool call: {data['intent']['tool']}")
+                        if agent == "multi":
+                            for branch in data.get("intents", []):
+                                thoughts_lines.append(f"→ {branch['agent']} ({branch['user']}): {branch['query']}")
+                        render_thoughts()
+                    elif event == "branch":
+                        thoughts_lines.append(f"{data['agent']} ({data['user']}) finished: {data['status']}")
+                        render_thoughts()
+                    elif event == "progress":
+                        stage = data.get("stage")
+                        if stage and stage != "routing":
+                            detail = data.get("agent") or data.get("tool") or data.get("job_id") or data.get("repo") or ""
+                            thoughts_lines.append(f"{stage.capitalize()} {detail}".strip() + "...")
+                            render_thoughts()
+                    elif event == "token":
+                        answer += data
+                        render_answer(answer)
+                    elif event == "result":
+                        result = data.get("result", "No response")
+                    elif event == "error":
+                        raise RuntimeError(data.get("error"))
+            
+            if result is None:
+                result = answer or "No response"
+            thoughts_lines.append("Done.")
+            render_thoughts()
+            render_answer(result)
+            thoughts = "<br>".join(html.escape(t) for t in thoughts_lines)
+            
+            # Display metadata
+            st.markdown(f"""
+            <div class="metadata">
+                <strong>Agent:</strong> {agent} | 
+                <strong>User:</strong> {user}
+                {f" | <strong>Repo:</strong> {repo}" if repo else ""}
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Save to session state
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": result,
+                "thoughts": thoughts,
+                "metadata": {
+                    "agent": agent,
+                    "user": user,
+                    "repo": repo
+                }
+            })
+            
+        except requests.exceptions.ConnectionError:
+            error_msg = "Cannot connect to the API server. Please make sure the FastAPI server is running on http://127.0.0.1:8002"
+            st.markdown(f'<div class="error-message">❌ {error_msg}</div>', unsafe_allow_html=True)
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": error_msg
+            })
+            
+        except Exception as e:
+            error_msg = f"An error occurred: {str(e)}"
+            st.markdown(f'<div class="error-message">❌ {error_msg}</div>', unsafe_allow_html=True)
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": error_msg
+            })
 
 # Footer
 st.divider()
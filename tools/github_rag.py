@@ -1,99 +1,154 @@
-import base64
+import hashlib
 from github import Github
 import google.generativeai as genai
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 from crewai.tools import tool
 import os
 from crewai.tools import tool
 from dotenv import load_dotenv
+from llm_client import get_model
+from tracing import traced
+from rag.index_store import RepoIndex, repo_lock
+from rag.fetcher import list_tree, fetch_files
+from rag.pipeline import IndexPipeline
+from rag.chunker import chunk_file, CHUNKER_VERSION
+from rag.indexing_jobs import index_jobs, JobQueueFull
+from rag.context import pack_context, CONTEXT_CANDIDATES
+from rag.answer_cache import answer_cache
+from rag.embedding_cache import cached_encode, get_embedding_cache
+from services.embedding_service import get_embedding_service
 
 load_dotenv()
 
+RAG_MODEL = os.getenv("RAG_MODEL", "gemini-pro-latest")
+# Answers are long generations: give them far more time than routing, and never hedge them
+RAG_LLM_TIMEOUT_S = float(os.getenv("RAG_LLM_TIMEOUT_S", "120"))
+
 class GitHubQA:
-    def __init__(self, github_token: str, gemini_key: str):
+    def __init__(self, github_token: str, gemini_key: str, model=None):
         self.github = Github(github_token)
-        genai.configure(api_key=gemini_key)
-        self.model = genai.GenerativeModel('gemini-pro-latest')
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        client = chromadb.Client(Settings(anonymized_telemetry=False, allow_reset=True))
-        try: 
-            client.delete_collection("repo")
-        except: 
-            pass
-        self.collection = client.create_collection("repo", metadata={"hnsw:space": "cosine"})
+        if model is None:
+            genai.configure(api_key=gemini_key)
+            model = get_model(RAG_MODEL)
+        self.model = model
+        self.embedder = get_embedding_service()
         
+        self.index = None
+        self.repo = None
         self.repo_name = None
+        self.head_sha = None
         self.is_ready = False
         
-    def extract_repo(self, repo_name: str):
-        print(f"Extracting: {repo_name}")
+    def open_repo(self, repo_name: str) -> str:
+        """Resolves the repo's head commit and attaches to its index without indexing anything."""
+        self.repo = self.github.get_repo(repo_name)
+        self.attach_index(repo_name, self.repo.get_branch(self.repo.default_branch).commit.sha)
+        return self.head_sha
+    
+    def attach_index(self, repo_name: str, head_sha: str):
+        """Attaches to the stored index of repo_name, treating head_sha as its current commit."""
         self.repo_name = repo_name
-        repo = self.github.get_repo(repo_name)
-        
-        docs, metas, ids = [], [], []
-        file_id = 0
-        contents = repo.get_contents("")
-        
-        text_exts = {'py','js','jsx','ts','tsx','java','cpp','c','h','cs','rb','go','rs',
-                     'php','html','css','json','xml','yaml','yml','md','txt','sh','sql'}
-        
-        while contents:
-            fc = contents.pop(0)
-            if fc.type == "dir":
-                contents.extend(repo.get_contents(fc.path))
-            elif fc.size < 500000:
-                ext = fc.name.split('.')[-1].lower() if '.' in fc.name else ''
-                if ext in text_exts or fc.name in ['Dockerfile','Makefile','README']:
-                    try:
-                        content = base64.b64decode(fc.content).decode('utf-8')
-                        chunks = self._chunk(content, fc.path)
-                        
-                        for i, chunk in enumerate(chunks):
-                            docs.append(chunk)
-                            metas.append({'file_path': fc.path, 'chunk': i})
-                            ids.append(f"f{file_id}_c{i}")
-                        
-                        file_id += 1
-                        print(f"✓ {fc.path}")
-                    except: 
-                        pass
-        
-        if docs:
-            embeddings = self.embedder.encode(docs, show_progress_bar=True).tolist()
-            self.collection.add(documents=docs, embeddings=embeddings, metadatas=metas, ids=ids)
-            self.is_ready = True
-        
-        print(f"Done! Files: {file_id}, Chunks: {len(docs)}")
-        return {'files': file_id, 'chunks': len(docs)}
+        self.head_sha = head_sha
+        self.index = RepoIndex(repo_name)
+        self.is_ready = self.index.count() > 0
     
-    def _chunk(self, text: str, path: str, size: int = 1000, overlap: int = 200):
-        header = f"File: {path}\n\n"
-        if len(text) <= size:
-            return [header + text]
-        
-        chunks, start = [], 0
-        while start < len(text):
-            end = start + size
-            if end < len(text):
-                nl = text.rfind('\n', start, end)
-                if nl > start + size // 2:
-                    end = nl
-            chunks.append(header + text[start:end])
-            start = end - overlap if end < len(text) else end
-        return chunks
+    @property
+    def is_current(self) -> bool:
+        """True when the index is a complete index of the head commit."""
+        return self.index is not None and self.index.is_current(self.head_sha)
     
-    def ask(self, question: str, n: int = 5):
-        if not self.is_ready:
-            return "System not ready. Repository needs to be extracted first."
+    @traced("rag.extract_repo")
+    def extract_repo(self, repo_name: str, on_progress=None):
+        self.open_repo(repo_name)
+        repo, head_sha = self.repo, self.head_sha
+        return self.sync_index(lambda: list_tree(repo, head_sha),
+                               lambda entries: fetch_files(repo, head_sha, entries),
+                               on_progress)
+    
+    @traced("rag.sync_index")
+    def sync_index(self, list_fn, fetch_fn, on_progress=None):
+        """
+        Brings the attached index up to date with the head commit.
+        list_fn() returns {path: TreeEntry}; fetch_fn(entries) yields (entry, text).
+        """
+        repo_name, head_sha = self.repo_name, self.head_sha
         
+        # Serialise indexing per repo; different repos index in parallel
+        with repo_lock(repo_name):
+            if self.index.is_current(head_sha):
+                print(f"Index up to date: {self.index.namespace}")
+                self.is_ready = True
+                return {'files': self.index.manifest.get('files', 0), 'chunks': self.index.count(),
+                        'commit': head_sha, 'cached': True}
+            
+            self.index.ensure_layout(CHUNKER_VERSION)
+            previous = self.index.commit_sha
+            print(f"Extracting: {repo_name}@{head_sha[:7]}" + (f" (from {previous[:7]})" if previous else ""))
+            
+            tree = list_fn()
+            blobs = {path: entry.sha for path, entry in tree.items()}
+            # Rough chunk estimate (~1 KB of text per chunk) to pick the vector store
+            self.index.choose_backend(sum(e.size for e in tree.values()) // 1000 + len(tree))
+            added, changed, removed = self.index.diff(blobs)
+            todo = added + changed
+            
+            # Drop stale chunks first; partially indexed files from an aborted run get rebuilt too
+            self.index.delete_files(todo + removed)
+            pipeline = IndexPipeline(
+                fetch_fn([tree[p] for p in todo]),
+                chunk_fn=self._chunk_records,
+                embed_fn=cached_encode,
+                upsert_fn=self.index.upsert,
+                total_files=len(todo),
+                on_progress=on_progress or self._print_progress,
+            )
+            try:
+                stats = pipeline.run()
+            except Exception:
+                # Keep what was written so the next run only redoes the remainder
+                done = set(pipeline.completed)
+                stale = set(todo) - done
+                self.index.commit(None, {p: sha for p, sha in blobs.items() if p not in stale})
+                self.is_ready = self.index.count() > 0
+                raise
+            self.index.commit(head_sha, blobs)
+            self.is_ready = self.index.count() > 0
+        
+        stats.update({'added': len(added), 'changed': len(changed), 'removed': len(removed)})
+        cache = get_embedding_cache().stats()
+        print(f"Done! Files: {stats['files']}, Chunks: {stats['chunks']} "
+              f"(+{len(added)} ~{len(changed)} -{len(removed)}) in {stats['seconds']:.1f}s, "
+              f"embedding cache hits: {cache['hits']}, misses: {cache['misses']}")
+        return {**stats, 'commit': head_sha, 'cached': False}
+    
+    def _chunk_records(self, path: str, text: str):
+        """Chunks a file into (id, document, metadata) records for the index."""
+        # Ids derive from the path so a changed file overwrites its own chunks
+        file_id = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        return [(f"{file_id}_c{i}", chunk.text,
+                 {'file_path': path, 'chunk': i, 'start_line': chunk.start_line,
+                  'end_line': chunk.end_line, 'symbol': chunk.symbol})
+                for i, chunk in enumerate(chunk_file(path, text))]
+    
+    def _print_progress(self, stats: dict):
+        total = stats['files_total'] or '?'
+        print(f"✓ {stats['files']}/{total} files, {stats['chunks']} chunks indexed")
+    
+    @traced("rag.retrieve")
+    def _prepare(self, question: str, n: int):
+        """Returns (question embedding, cacheable, cached answer or None, prompt or None)."""
         qemb = self.embedder.encode([question])[0].tolist()
-        results = self.collection.query(query_embeddings=[qemb], n_results=min(n, self.collection.count()))
         
-        context = "\n".join([f"--- {m['file_path']} ---\n{d}\n" 
-                            for d, m in zip(results['documents'][0], results['metadatas'][0])])
+        # Only answers from a complete index of the head commit are cached/served from cache
+        cacheable = self.is_current
+        if cacheable:
+            cached = answer_cache.lookup(self.repo_name, self.head_sha, qemb)
+            if cached is not None:
+                return qemb, cacheable, cached, None
+        
+        results = self.index.query(qemb, n)
+        
+        # Merge overlapping chunks and fit the best ones into the token budget
+        context = pack_context(results['documents'][0], results['metadatas'][0])
         
         prompt = f"""Analyze GitHub repo: {self.repo_name}
 
@@ -103,36 +158,134 @@ Context:
 Question: {question}
 
 Provide concise answer with file references and code snippets. Don't over explain and no emojis. Just answer the user's query in enough words"""
-
+        return qemb, cacheable, None, prompt
+    
+    @traced("rag.ask")
+    def ask(self, question: str, n: int = CONTEXT_CANDIDATES):
+        if not self.is_ready:
+            return "System not ready. Repository needs to be extracted first."
+        
+        qemb, cacheable, cached, prompt = self._prepare(question, n)
+        if cached is not None:
+            return cached
+        
         try:
-            return self.model.generate_content(prompt).text
+            answer = self.model.generate_content(prompt, timeout=RAG_LLM_TIMEOUT_S, hedge=False).text
         except Exception as e:
             return f"Error: {e}"
+        
+        if cacheable:
+            answer_cache.put(self.repo_name, self.head_sha, qemb, question, answer)
+        return answer
+    
+    def ask_stream(self, question: str, n: int = CONTEXT_CANDIDATES):
+        """Like ask(), but yields the answer text piece by piece as Gemini produces it."""
+        if not self.is_ready:
+            yield "System not ready. Repository needs to be extracted first."
+            return
+        
+        qemb, cacheable, cached, prompt = self._prepare(question, n)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True, timeout=RAG_LLM_TIMEOUT_S):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                parts.append(text)
+                yield text
+        except Exception as e:
+            yield f"Error: {e}"
+            return
+        
+        if cacheable:
+            answer_cache.put(self.repo_name, self.head_sha, qemb, question, "".join(parts))
 
 
-# Standalone function for direct calls (not wrapped in CrewAI tool)
-def github_repo_qa_direct(user: str, repo_name: str, question: str) -> str:
-    """Answer questions about code inside a GitHub repository using RAG (Retrieval-Augmented Generation)."""
+def _credentials(user: str):
     github_token = os.getenv(f"GITHUB_TOKEN_{user.upper()}")
     gemini_key = os.getenv("GEMINI_API_KEY")
     
     if not github_token:
-        return f"Error: Missing GitHub token for user {user}"
-    
+        raise ValueError(f"Missing GitHub token for user {user}")
     if not gemini_key:
-        return "Error: Missing Gemini API key"
+        raise ValueError("Missing Gemini API key")
+    return github_token, gemini_key
+
+
+def _submit_indexing(qa: GitHubQA, github_token: str, gemini_key: str):
+    """Queues a background (re)index of qa's repo at its head commit (deduplicated per repo@SHA)."""
+    repo_name = qa.repo_name
+    
+    def run(on_progress):
+        return GitHubQA(github_token, gemini_key).extract_repo(repo_name, on_progress=on_progress)
+    
+    return index_jobs.submit(repo_name, qa.head_sha, run)
+
+
+def start_repo_indexing(user: str, repo_name: str):
+    """Starts (or joins) the indexing job for the repo's head commit and returns it."""
+    github_token, gemini_key = _credentials(user)
+    qa = GitHubQA(github_token, gemini_key)
+    qa.open_repo(repo_name)
+    return _submit_indexing(qa, github_token, gemini_key)
+
+
+def github_repo_qa_stream(user: str, repo_name: str, question: str):
+    """
+    Streaming variant of github_repo_qa_direct. Yields (event, data) pairs:
+    ("progress", {...}) while preparing and ("token", text) for answer text.
+    """
+    try:
+        github_token, gemini_key = _credentials(user)
+    except ValueError as e:
+        yield "token", f"Error: {e}"
+        return
     
     try:
+        yield "progress", {"stage": "resolving", "repo": repo_name}
         qa = GitHubQA(github_token, gemini_key)
-        qa.extract_repo(repo_name)
-        answer = qa.ask(question)
-        return f"📚 Answer for repo '{repo_name}':\n{answer}"
+        qa.open_repo(repo_name)
+        
+        note = ""
+        if not qa.is_current:
+            job = _submit_indexing(qa, github_token, gemini_key)
+            yield "progress", {"stage": "indexing", "job_id": job.id, "status": job.status}
+            if not qa.is_ready:
+                yield "token", (f"⏳ Repository '{repo_name}' is being indexed (job {job.id}). "
+                                f"Please retry shortly.")
+                return
+            note = f"\n\n(Answered from a partial or older index; re-indexing in progress, job {job.id}.)"
+        elif not qa.is_ready:
+            yield "token", f"Repository '{repo_name}' has no indexable source files at {qa.head_sha[:7]}."
+            return
+        
+        yield "progress", {"stage": "retrieving", "commit": qa.head_sha}
+        yield "token", f"📚 Answer for repo '{repo_name}':\n"
+        for text in qa.ask_stream(question):
+            yield "token", text
+        if note:
+            yield "token", note
+    except JobQueueFull:
+        yield "token", f"⏳ Indexing queue is full, please retry '{repo_name}' in a minute."
     except Exception as e:
-        return f"Error processing repo Q&A: {str(e)}"
+        yield "token", f"Error processing repo Q&A: {str(e)}"
+
+
+# Standalone function for direct calls (not wrapped in CrewAI tool)
+def github_repo_qa_direct(user: str, repo_name: str, question: str) -> str:
+    """Answer questions about code inside a GitHub repository using RAG (Retrieval-Augmented Generation)."""
+    return "".join(data for event, data in github_repo_qa_stream(user, repo_name, question) if event == "token")
 
 
 # CrewAI Tool for GitHub RAG Q&A (for use with agents)
 @tool("github_repo_qa")
+@traced("tool.github_repo_qa")
 def github_repo_qa(user: str, repo_name: str, question: str) -> str:
     """Answer questions about code inside a GitHub repository using RAG (Retrieval-Augmented Generation)."""
-    return github_repo_qa_direct(user, repo_name, question)
\ No newline at end of file
+    return github_repo_qa_direct(user, repo_name, question)
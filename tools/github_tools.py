@@ -1,7 +1,9 @@
 from crewai.tools import tool
 from services.github_services import GitHubService
+from tracing import traced
 
 @tool("github_list_repos")
+@traced("tool.github_list_repos")
 def github_list_repos(user: str) -> str:
     """Lists all GitHub repositories for the given user."""
     gh = GitHubService(user.lower())
@@ -9,6 +11,7 @@ def github_list_repos(user: str) -> str:
     return f"📂 Repositories for {user}:\n" + "\n".join(repos)
 
 @tool("github_list_prs")
+@traced("tool.github_list_prs")
 def github_list_prs(user: str) -> str:
     """Lists open pull requests for the given user."""
     gh = GitHubService(user.lower())
@@ -19,6 +22,7 @@ def github_list_prs(user: str) -> str:
     return f"🔀 Open PRs for {user}:\n{formatted}"
 
 @tool("github_list_starred")
+@traced("tool.github_list_starred")
 def github_list_starred(user: str) -> str:
     """Lists starred GitHub repositories for the given user."""
     gh = GitHubService(user.lower())
@@ -26,6 +30,7 @@ def github_list_starred(user: str) -> str:
     return f"⭐ Starred repos for {user}:\n" + "\n".join(stars)
 
 @tool("github_list_issues")
+@traced("tool.github_list_issues")
 def github_list_issues(user: str) -> str:
     """Lists GitHub issues for the given user."""
     gh = GitHubService(user.lower())
@@ -33,6 +38,7 @@ def github_list_issues(user: str) -> str:
     return f"🐛 Issues for {user}:\n" + "\n".join([f"{i['title']} ({i['repo']})" for i in issues])
 
 @tool("github_list_branches")
+@traced("tool.github_list_branches")
 def github_list_branches(user: str, repo_name: str) -> str:
     """Lists branches in the specified GitHub repository for the given user."""
     gh = GitHubService(user.lower())
@@ -40,6 +46,7 @@ def github_list_branches(user: str, repo_name: str) -> str:
     return f"🌿 Branches in {repo_name} for {user}:\n" + "\n".join(branches)
 
 @tool("github_list_commits")
+@traced("tool.github_list_commits")
 def github_list_commits(user: str, repo_name: str) -> str:
     """Lists recent commits in the specified GitHub repository for the given user."""
     gh = GitHubService(user.lower())
@@ -47,6 +54,7 @@ def github_list_commits(user: str, repo_name: str) -> str:
     return f"📦 Commits in {repo_name}:\n" + "\n".join([f"{c['sha']} - {c['message']}" for c in commits[:10]])
 
 @tool("github_search_repos")
+@traced("tool.github_search_repos")
 def github_search_repos(query: str) -> str:
     """Searches GitHub repositories globally using the given query."""
     gh = GitHubService("user1")  # search global
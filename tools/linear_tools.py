@@ -1,46 +1,72 @@
 from crewai.tools import tool
 from services.linear_services import LinearService
+from tracing import traced
+
+
+def _nodes(data: dict, key: str):
+    return (data.get("data") or {}).get(key, {}).get("nodes", [])
+
+
+def _format_issues(data: dict, header: str, empty: str) -> str:
+    issues = _nodes(data, "issues")
+    if not issues:
+        errors = data.get("errors")
+        return f"❌ Linear error: {errors[0].get('message')}" if errors else empty
+    lines = []
+    for i in issues:
+        line = f"{i['title']} - {i['state']['name']}"
+        if i.get("priority") is not None:
+            line += f" (priority {i['priority']})"
+        lines.append(line)
+    return f"{header}\n" + "\n".join(lines)
+
 
 @tool("linear_list_issues")
+@traced("tool.linear_list_issues")
 def linear_list_issues(user: str) -> str:
     """List all issues assigned to the Linear user."""
     client = LinearService(user.lower())
     data = client.list_issues()
-
-    issues = data.get("data", {}).get("issues", {}).get("nodes", [])
-    if not issues:
-        return f"No issues found for {user}"
-
-    formatted = "\n".join([f"{i['title']} - {i['state']['name']}" for i in issues])
-    return f"📝 Issues for {user}:\n{formatted}"
+    return _format_issues(data, f"📝 Issues for {user}:", f"No issues found for {user}")
 
 @tool("linear_in_progress")
+@traced("tool.linear_in_progress")
 def linear_in_progress(user: str) -> str:
     """List all in-progress issues for the Linear user."""
     client = LinearService(user.lower())
     data = client.list_in_progress()
-    return str(data)
+    return _format_issues(data, f"🚧 In-progress issues for {user}:", f"No in-progress issues for {user}")
 
 @tool("linear_high_priority")
+@traced("tool.linear_high_priority")
 def linear_high_priority(user: str) -> str:
     """List all high priority issues for the Linear user."""
     client = LinearService(user.lower())
     data = client.list_high_priority()
-    return str(data)
+    return _format_issues(data, f"🔥 High priority issues for {user}:", f"No high priority issues for {user}")
 
 @tool("linear_teams")
+@traced("tool.linear_teams")
 def linear_teams(user: str) -> str:
     """List all teams for the Linear user."""
     client = LinearService(user.lower())
-    return str(client.list_teams())
+    teams = _nodes(client.list_teams(), "teams")
+    if not teams:
+        return f"No teams found for {user}"
+    return f"👥 Teams for {user}:\n" + "\n".join(t["name"] for t in teams)
 
 @tool("linear_projects")
+@traced("tool.linear_projects")
 def linear_projects(user: str) -> str:
     """List all projects for the Linear user."""
     client = LinearService(user.lower())
-    return str(client.list_projects())
+    projects = _nodes(client.list_projects(), "projects")
+    if not projects:
+        return f"No projects found for {user}"
+    return f"📁 Projects for {user}:\n" + "\n".join(f"{p['name']} - {p['state']}" for p in projects)
 
 @tool("linear_create_issue")
+@traced("tool.linear_create_issue")
 def linear_create_issue(user: str, title: str, desc: str) -> str:
     """Create a new issue for the Linear user with the given title and description."""
     client = LinearService(user.lower())
@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import random
+import inspect
+import argparse
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(".traces", "spans.jsonl"))
+# Share of traces recorded; decided once per trace at its root span
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+# The export file is rotated past this size, keeping TRACE_BACKUPS older files (.1 newest)
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "3"))
+TRACE_FLUSH_S = 1.0
+
+_current_span = ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+class Span:
+    """One timed operation within a trace. Attributes can be added while it runs via set()."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start", "_t0",
+                 "duration_ms", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id=None, attrs=None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+        }
+        if self.error:
+            record["error"] = self.error
+        if self.attrs:
+            record["attrs"] = self.attrs
+        return record
+
+
+class JsonlExporter:
+    """
+    Appends finished spans to a JSONL file, one object per line. Writes are
+    buffered and flushed at most every TRACE_FLUSH_S; the file is rotated
+    once it passes max_bytes, so disk use stays under (backups + 1) files.
+    """
+
+    def __init__(self, path: str = TRACE_EXPORT_PATH, max_bytes: int = TRACE_MAX_BYTES,
+                 backups: int = TRACE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+        self._size = 0
+        self._flushed = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # Caller holds self._lock
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        # Caller holds self._lock
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+                if self._size and self._size + len(line) > self.max_bytes:
+                    self._rotate()
+                self._file.write(line)
+                self._size += len(line)
+                now = time.monotonic()
+                if now - self._flushed >= TRACE_FLUSH_S:
+                    self._file.flush()
+                    self._flushed = now
+            except OSError as e:
+                print("⚠️ Could not export span:", e)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+
+exporter = JsonlExporter()
+atexit.register(exporter.flush)
+
+
+class _NoopSpan:
+    trace_id = span_id = None
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _UnsampledSpan(_NoopSpan):
+    """Stands in for the spans of a trace that sampling left out, so its children are skipped too."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+
+
+@contextmanager
+def span(name: str, trace_id: str = None, **attrs):
+    """
+    Times the enclosed block as a child of the current span (or as a new root
+    when there is none, or trace_id is given). Roots are kept with probability
+    TRACE_SAMPLE_RATE and their children follow that decision. Exceptions
+    mark the span as failed and propagate.
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+
+    parent = _current_span.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else new_trace_id()
+    if parent is None or parent.trace_id != trace_id:
+        parent = None
+        if random.random() >= TRACE_SAMPLE_RATE:
+            parent = _UnsampledSpan(trace_id)
+    if isinstance(parent, _UnsampledSpan):
+        token = _current_span.set(parent)
+        try:
+            yield parent
+        finally:
+            _current_span.reset(token)
+        return
+
+    current = Span(name, trace_id, parent.span_id if parent else None, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration_ms = round((time.perf_counter() - current._t0) * 1000, 3)
+        exporter.export(current)
+
+
+def traced(name: str = None, **attrs):
+    """Decorator running each call of a (sync or async) function inside a span."""
+
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attrs):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attrs):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# -------------------- Latency Breakdown CLI --------------------
+def load_spans(path: str = TRACE_EXPORT_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def summarize(spans) -> list:
+    """Per span name: count, errors and latency percentiles in ms, slowest total first."""
+    by_name = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s)
+    rows = []
+    for name, group in by_name.items():
+        durations = [s["duration_ms"] for s in group]
+        rows.append({
+            "name": name,
+            "count": len(group),
+            "errors": sum(1 for s in group if s["status"] != "ok"),
+            "total_ms": round(sum(durations), 1),
+            "p50_ms": round(_percentile(durations, 50), 1),
+            "p95_ms": round(_percentile(durations, 95), 1),
+            "max_ms": round(max(durations), 1),
+        })
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def trace_tree(spans, trace_id: str) -> list:
+    """Lines of an indented, time-ordered span tree for one trace."""
+    spans = sorted((s for s in spans if s["trace_id"] == trace_id), key=lambda s: s["start"])
+    ids = {s["span_id"] for s in spans}
+    children = {}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    lines = []
+
+    def walk(parent, depth):
+        for s in children.get(parent, []):
+            flag = "" if s["status"] == "ok" else f"  [{s.get('error', 'error')}]"
+            lines.append(f"{'  ' * depth}{s['name']}  {s['duration_ms']:.1f} ms{flag}")
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage latency breakdown of exported traces.")
+    parser.add_argument("command", choices=["summarize", "show"])
+    parser.add_argument("--path", default=TRACE_EXPORT_PATH, help="spans JSONL file")
+    parser.add_argument("--trace", help="trace id to show (default: slowest root span)")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.path)
+    if not spans:
+        print("No spans recorded.")
+        return
+
+    if args.command == "summarize":
+        print(f"{'stage':<40} {'count':>6} {'errors':>6} {'total ms':>11} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+        for r in summarize(spans):
+            print(f"{r['name'][:40]:<40} {r['count']:>6} {r['errors']:>6} {r['total_ms']:>11} "
+                  f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['max_ms']:>9}")
+    else:
+        trace_id = args.trace
+        if trace_id is None:
+            roots = [s for s in spans if s["parent_id"] is None]
+            trace_id = max(roots or spans, key=lambda s: s["duration_ms"])["trace_id"]
+        print(f"Trace {trace_id}")
+        print("\n".join(trace_tree(spans, trace_id)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())